@@ -0,0 +1,170 @@
+import json
+import math
+import time
+from typing import Any, Dict, List, Optional
+from .telemetry import TelemetryHook
+
+
+class AdaptiveLimits(TelemetryHook):
+    """AIMD controller for the stream's in-flight limit and the pack size.
+
+    Both set how much load reaches the endpoint: requests in flight, and
+    words per request (``AACService.pack_size``). The pack size stays
+    within ``min_pack_size`` and the service's ``max_pack_size``, so
+    unpacked runs keep requesting one word at a time.
+
+    Every ``window`` requests it looks at what the window saw: any new 429
+    (the LLM's "throttled" gauge), an error rate above ``max_error_rate`` or
+    a median latency above the target cuts both limits by ``decrease``;
+    otherwise they grow by ``increase``, except right after a growth step
+    that did not raise token throughput, which is held once. The latency
+    target is ``target_latency`` or, when unset, ``latency_tolerance`` times
+    the best window median seen so far. Decisions are printed and, with
+    ``log_path``, appended as JSON lines.
+
+    Feedback comes from per-request telemetry, so the controller only acts
+    when requests go through the stream (``streaming=True`` or
+    ``stream_cards``); distilabel pipelines run in subprocesses.
+    """
+
+    def __init__(
+        self,
+        min_in_flight: int = 1,
+        max_in_flight: int = 64,
+        min_pack_size: int = 1,
+        window: int = 20,
+        target_latency: Optional[float] = None,
+        latency_tolerance: float = 2.0,
+        max_error_rate: float = 0.05,
+        increase: int = 1,
+        decrease: float = 0.5,
+        log_path: Optional[str] = None,
+    ):
+        self.min_in_flight = min_in_flight
+        self.max_in_flight = max_in_flight
+        self.min_pack_size = min_pack_size
+        self.max_pack_size = 1
+        self.pack_size = 1
+        self.in_flight = min_in_flight
+        self.window = window
+        self.target_latency = target_latency
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.increase = increase
+        self.decrease = decrease
+        self.log_path = log_path
+        self.service = None
+        self.decisions = 0
+        self._latencies: List[float] = []
+        self._errors = 0
+        self._window_started = time.perf_counter()
+        self._best_latency: Optional[float] = None
+        self._last_action: Optional[str] = None
+        self._last_throughput: Optional[float] = None
+        self._throttled = 0
+        self._tokens = 0
+
+    @staticmethod
+    def _clamp(value: int, low: int, high: int) -> int:
+        return max(low, min(high, value))
+
+    def bind(self, service):
+        self.service = service
+        self.in_flight = self._clamp(service.stream.max_in_flight, self.min_in_flight, self.max_in_flight)
+        self.max_pack_size = service.max_pack_size
+        self.pack_size = self._clamp(service.pack_size, 1, self.max_pack_size)
+        self.min_pack_size = min(self.min_pack_size, self.max_pack_size)
+        gauges = service.runtime_gauges()
+        self._throttled = gauges.get("throttled", 0)
+        self._tokens = gauges.get("total_tokens", 0)
+        self._apply()
+
+    def _apply(self):
+        self.service.stream.max_in_flight = self.in_flight
+        self.service.pack_size = self.pack_size
+
+    def on_request(self, seconds: float, ok: bool):
+        self._latencies.append(seconds)
+        if not ok:
+            self._errors += 1
+        if len(self._latencies) >= self.window:
+            self._decide()
+
+    def _decide(self):
+        now = time.perf_counter()
+        elapsed = max(now - self._window_started, 1e-9)
+        latencies = sorted(self._latencies)
+        median = latencies[len(latencies) // 2]
+        error_rate = self._errors / len(latencies)
+        gauges = self.service.runtime_gauges() if self.service is not None else {}
+        throttled = gauges.get("throttled", 0) - self._throttled
+        tokens = gauges.get("total_tokens", 0) - self._tokens
+        throughput = tokens / elapsed if tokens else len(latencies) / elapsed
+        if self._best_latency is None or median < self._best_latency:
+            self._best_latency = median
+        target = self.target_latency or self._best_latency * self.latency_tolerance
+
+        if throttled > 0:
+            action = "decrease"
+            reason = f"{throttled} throttled"
+        elif error_rate > self.max_error_rate:
+            action = "decrease"
+            reason = f"error rate {error_rate:.0%}"
+        elif median > target:
+            action = "decrease"
+            reason = f"median latency {median:.2f}s > {target:.2f}s"
+        elif (
+            self._last_action == "increase"
+            and self._last_throughput is not None
+            and throughput <= self._last_throughput
+        ):
+            action = "hold"
+            reason = "throughput did not improve"
+        else:
+            action = "increase"
+            reason = "healthy"
+
+        previous = (self.in_flight, self.pack_size)
+        if action == "decrease":
+            self.in_flight = self._clamp(
+                math.floor(self.in_flight * self.decrease), self.min_in_flight, self.max_in_flight
+            )
+            self.pack_size = self._clamp(
+                math.floor(self.pack_size * self.decrease), self.min_pack_size, self.max_pack_size
+            )
+        elif action == "increase":
+            self.in_flight = self._clamp(self.in_flight + self.increase, self.min_in_flight, self.max_in_flight)
+            self.pack_size = self._clamp(self.pack_size + self.increase, self.min_pack_size, self.max_pack_size)
+        if self.service is not None:
+            self._apply()
+        self._log({
+            "time": time.time(),
+            "action": action,
+            "reason": reason,
+            "in_flight": [previous[0], self.in_flight],
+            "pack_size": [previous[1], self.pack_size],
+            "median_latency": median,
+            "error_rate": error_rate,
+            "throttled": throttled,
+            "throughput": throughput,
+        })
+
+        self.decisions += 1
+        self._last_action = action
+        self._last_throughput = throughput
+        self._throttled += throttled
+        self._tokens += tokens
+        self._latencies = []
+        self._errors = 0
+        self._window_started = now
+
+    def _log(self, decision: Dict[str, Any]):
+        if decision["action"] != "hold":
+            print(
+                f"Adaptive limits: {decision['action']} ({decision['reason']}), "
+                f"in flight {decision['in_flight'][0]} -> {decision['in_flight'][1]}, "
+                f"pack size {decision['pack_size'][0]} -> {decision['pack_size'][1]}"
+            )
+        if self.log_path:
+            with open(self.log_path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(decision) + "\n")
@@ -0,0 +1,156 @@
+import hashlib
+import json
+import sqlite3
+import time
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+class ResponseCache:
+    """Content-addressed store of LLM generations.
+
+    Entries are keyed by a hash of the full request (model, system prompt,
+    instruction and generation kwargs). In ``read_only`` mode nothing is
+    written and callers are expected to skip misses instead of generating
+    them, so a re-export only ever reproduces responses already on disk.
+    """
+
+    EVICT_EVERY = 1000
+
+    def __init__(
+        self,
+        path: str,
+        max_entries: Optional[int] = None,
+        max_bytes: Optional[int] = None,
+        max_age: Optional[float] = None,
+        read_only: bool = False,
+    ):
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.read_only = read_only
+        self.hits = 0
+        self.misses = 0
+        self._puts_since_evict = 0
+        if read_only:
+            self.conn = sqlite3.connect(f"file:{path}?mode=ro", uri=True)
+        else:
+            self.conn = sqlite3.connect(path)
+            self.conn.execute("PRAGMA journal_mode=WAL")
+            self.conn.execute("PRAGMA synchronous=NORMAL")
+            self.conn.execute(
+                """CREATE TABLE IF NOT EXISTS responses (
+                    key TEXT PRIMARY KEY,
+                    response TEXT NOT NULL,
+                    size INTEGER NOT NULL,
+                    created_at REAL NOT NULL,
+                    accessed_at REAL NOT NULL
+                )"""
+            )
+            self.conn.execute(
+                "CREATE INDEX IF NOT EXISTS responses_accessed_at ON responses (accessed_at)"
+            )
+            self.conn.commit()
+            self.evict()
+
+    @staticmethod
+    def make_key(
+        model: str, system_prompt: str, instruction: str, generation_kwargs: Dict[str, Any]
+    ) -> str:
+        payload = json.dumps(
+            [model, system_prompt, instruction, generation_kwargs],
+            sort_keys=True,
+            ensure_ascii=False,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get_many(self, keys: Iterable[str]) -> Dict[str, str]:
+        keys = list(dict.fromkeys(keys))
+        found: Dict[str, str] = {}
+        min_created = time.time() - self.max_age if self.max_age else 0
+        # Stay well below SQLite's bound-parameter limit.
+        for start in range(0, len(keys), 500):
+            chunk = keys[start:start + 500]
+            placeholders = ", ".join("?" for _ in chunk)
+            rows = self.conn.execute(
+                f"SELECT key, response FROM responses WHERE key IN ({placeholders}) AND created_at >= ?",
+                [*chunk, min_created],
+            )
+            found.update(rows)
+        self.hits += len(found)
+        self.misses += len(keys) - len(found)
+        if found and not self.read_only:
+            now = time.time()
+            self.conn.executemany(
+                "UPDATE responses SET accessed_at = ? WHERE key = ?",
+                [(now, key) for key in found],
+            )
+            self.conn.commit()
+        return found
+
+    def get(self, key: str) -> Optional[str]:
+        return self.get_many([key]).get(key)
+
+    def put_many(self, items: List[Tuple[str, str]]):
+        if self.read_only or not items:
+            return
+        now = time.time()
+        self.conn.executemany(
+            "INSERT OR REPLACE INTO responses (key, response, size, created_at, accessed_at) VALUES (?, ?, ?, ?, ?)",
+            [(key, response, len(response.encode("utf-8")), now, now) for key, response in items],
+        )
+        self.conn.commit()
+        self._puts_since_evict += len(items)
+        if self._puts_since_evict >= self.EVICT_EVERY:
+            self.evict()
+
+    def put(self, key: str, response: str):
+        self.put_many([(key, response)])
+
+    def evict(self) -> int:
+        if self.read_only:
+            return 0
+        self._puts_since_evict = 0
+        removed = 0
+        if self.max_age:
+            removed += self.conn.execute(
+                "DELETE FROM responses WHERE created_at < ?", (time.time() - self.max_age,)
+            ).rowcount
+        entries, total_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        over_entries = entries - self.max_entries if self.max_entries else 0
+        over_bytes = total_bytes - self.max_bytes if self.max_bytes else 0
+        if over_entries > 0 or over_bytes > 0:
+            # Least recently used entries go first until both limits hold.
+            doomed = []
+            for key, size in self.conn.execute(
+                "SELECT key, size FROM responses ORDER BY accessed_at"
+            ):
+                if over_entries <= 0 and over_bytes <= 0:
+                    break
+                doomed.append((key,))
+                over_entries -= 1
+                over_bytes -= size
+            self.conn.executemany("DELETE FROM responses WHERE key = ?", doomed)
+            removed += len(doomed)
+        self.conn.commit()
+        return removed
+
+    def stats(self) -> Dict[str, Any]:
+        entries, total_bytes = self.conn.execute(
+            "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses"
+        ).fetchone()
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "entries": entries,
+            "bytes": total_bytes,
+        }
+
+    def close(self):
+        if not self.read_only:
+            self.evict()
+        self.conn.close()
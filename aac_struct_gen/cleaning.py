@@ -0,0 +1,126 @@
+from collections import Counter
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Dict, Set
+import pandas as pd
+import unidecode
+from .text import NON_ALNUM, clean_text
+
+
+# Stand-in dedup key for rows whose input is missing; "\x00" can never
+# survive clean_text, so it cannot collide with a real input.
+MISSING_KEY = "\x00"
+
+
+@lru_cache(maxsize=1 << 18)
+def _transliterate(text: str) -> str:
+    return unidecode.unidecode(text)
+
+
+def clean_series(inputs: pd.Series) -> pd.Series:
+    lowered = inputs.str.lower()
+    # unidecode has no vectorized form, so it runs once per distinct value.
+    uniques = lowered.dropna().unique()
+    transliterated = lowered.map(
+        dict(zip(uniques, (_transliterate(value) for value in uniques)))
+    )
+    return transliterated.str.replace(NON_ALNUM, "", regex=True).str.strip()
+
+
+def valid_output_mask(outputs: pd.Series) -> pd.Series:
+    return outputs.str.strip().str.count("\n").eq(4).fillna(False).astype(bool)
+
+
+@dataclass
+class CleaningStats:
+    total_rows: int = 0
+    invalid_rows: int = 0
+    duplicate_rows: int = 0
+    kept_rows: int = 0
+
+
+class DatasetCleaner:
+    """Chunked equivalent of the cleaning loop in filtering_data.ipynb.
+
+    Inputs are normalized with ``clean_text`` semantics, rows whose output
+    does not have exactly five lines are dropped, and the first valid row
+    for every cleaned input wins. Only one chunk and the set of seen keys
+    are held in memory.
+    """
+
+    def __init__(self, chunksize: int = 100_000):
+        self.chunksize = chunksize
+        self.seen: Set[str] = set()
+        self.input_counts: Counter = Counter()
+        self.stats = CleaningStats()
+
+    def process_chunk(self, chunk: pd.DataFrame) -> pd.DataFrame:
+        cleaned = clean_series(chunk["input"])
+        valid = valid_output_mask(chunk["output"])
+        keys = cleaned.fillna(MISSING_KEY)
+
+        valid_keys = keys[valid]
+        self.input_counts.update(valid_keys.value_counts().to_dict())
+        first = ~valid_keys.duplicated(keep="first")
+        unseen = pd.Series(
+            [key not in self.seen for key in valid_keys], index=valid_keys.index, dtype=bool
+        )
+        keep = first & unseen
+        self.seen.update(valid_keys[keep])
+
+        self.stats.total_rows += len(chunk)
+        self.stats.invalid_rows += int((~valid).sum())
+        self.stats.duplicate_rows += int((~keep).sum())
+        self.stats.kept_rows += int(keep.sum())
+
+        kept_index = keep.index[keep.to_numpy()]
+        return pd.DataFrame(
+            {
+                "input": cleaned.loc[kept_index].to_numpy(),
+                "output": chunk["output"].loc[kept_index].to_numpy(),
+            }
+        )
+
+    def clean_csv(self, input_path: str, output_path: str) -> CleaningStats:
+        header = True
+        with open(output_path, "w", encoding="utf-8", newline="") as out:
+            for chunk in pd.read_csv(
+                input_path,
+                dtype=str,
+                usecols=["input", "output"],
+                chunksize=self.chunksize,
+            ):
+                kept = self.process_chunk(chunk)
+                if header or not kept.empty:
+                    kept.to_csv(out, index=False, header=header)
+                    header = False
+        return self.stats
+
+    def duplicate_counts(self) -> Dict[str, int]:
+        return {
+            (None if key == MISSING_KEY else key): count
+            for key, count in self.input_counts.items()
+            if count > 1
+        }
+
+
+def count_cleaned_inputs(path: str, chunksize: int = 100_000) -> Counter:
+    counts: Counter = Counter()
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+        chunk = chunk.dropna()
+        # value_counts() keeps first-seen order on ties, matching the
+        # insertion order of the Counter loop in data.ipynb.
+        counts.update(clean_series(chunk["input"]).value_counts(sort=False).to_dict())
+    return counts
+
+
+def duplicate_report(path: str, report_path: str, chunksize: int = 100_000) -> pd.DataFrame:
+    counts = count_cleaned_inputs(path, chunksize)
+    report = pd.DataFrame(
+        [{"input": key, "count": count} for key, count in counts.items() if count > 1],
+        columns=["input", "count"],
+    )
+    if not report.empty:
+        report = report.sort_values("count", ascending=False)
+        report.to_csv(report_path, index=False)
+    return report
@@ -0,0 +1,178 @@
+import glob
+import os
+from typing import Dict, Iterator, List, Optional
+import pandas as pd
+import pyarrow as pa
+import pyarrow.parquet as pq
+from .models import DatasetRow
+from .parsing import option_parts
+from .sinks import DatasetSink, SinkConfig
+
+
+OPTION_TYPE = pa.struct([
+    ("text", pa.string()),
+    ("spoken_text", pa.string()),
+    ("emoji", pa.string()),
+])
+# "output" keeps the exact CSV text, so converting back is lossless;
+# "options" is the parsed view for column-wise use.
+CARD_SCHEMA = pa.schema([
+    ("input", pa.string()),
+    ("output", pa.string()),
+    ("options", pa.list_(OPTION_TYPE)),
+])
+
+
+def is_columnar(path: str) -> bool:
+    return path.endswith((".parquet", ".arrow"))
+
+
+def split_options(output: str) -> List[Dict[str, Optional[str]]]:
+    # Lines that are not "text, spoken_text, emoji" are kept whole in
+    # "text" so that nothing is lost converting older datasets.
+    options = []
+    for line in output.split("\n"):
+        if not line.strip():
+            continue
+        parts = option_parts(line)
+        if parts is None:
+            options.append({"text": line.strip(), "spoken_text": None, "emoji": None})
+        else:
+            options.append(dict(zip(("text", "spoken_text", "emoji"), parts)))
+    return options
+
+
+def join_options(options: List[Dict[str, Optional[str]]]) -> str:
+    return "\n".join(
+        ", ".join(
+            part for part in (option["text"], option["spoken_text"], option["emoji"])
+            if part is not None
+        )
+        for option in options
+    )
+
+
+def rows_to_table(rows: List[DatasetRow]) -> pa.Table:
+    return pa.Table.from_pydict(
+        {
+            "input": [row.input for row in rows],
+            "output": [row.output for row in rows],
+            "options": [split_options(row.output) for row in rows],
+        },
+        schema=CARD_SCHEMA,
+    )
+
+
+def frame_to_table(frame: pd.DataFrame) -> pa.Table:
+    outputs = frame["output"].fillna("").tolist()
+    return pa.Table.from_pydict(
+        {
+            "input": frame["input"].fillna("").tolist(),
+            "output": outputs,
+            "options": [split_options(output) for output in outputs],
+        },
+        schema=CARD_SCHEMA,
+    )
+
+
+def table_to_frame(table: pa.Table) -> pd.DataFrame:
+    # The CSV layout: one "output" string per card. Files written before
+    # the "output" column existed are rebuilt from their options.
+    outputs = (
+        table.column("output").to_pylist()
+        if "output" in table.schema.names
+        else [None] * table.num_rows
+    )
+    return pd.DataFrame({
+        "input": table.column("input").to_pylist(),
+        "output": [
+            output if output is not None else join_options(options)
+            for output, options in zip(outputs, table.column("options").to_pylist())
+        ],
+    })
+
+
+def table_to_rows(table: pa.Table) -> Iterator[DatasetRow]:
+    frame = table_to_frame(table)
+    for input_text, output_text in zip(frame["input"], frame["output"]):
+        yield DatasetRow(input=input_text, output=output_text)
+
+
+def read_cards(path: str, columns: Optional[List[str]] = None) -> pa.Table:
+    """Reads a columnar dataset, loading only ``columns`` when given.
+
+    ``.arrow`` files are memory-mapped and read without copying; Parquet
+    datasets (a directory of part files, or a single file) are read with
+    memory-mapped I/O and column pruning.
+    """
+    if path.endswith(".arrow"):
+        with pa.memory_map(path, "r") as source:
+            table = pa.ipc.open_file(source).read_all()
+        return table.select(columns) if columns else table
+    return pq.read_table(path, columns=columns, memory_map=True, schema=CARD_SCHEMA)
+
+
+def write_arrow(tables: Iterator[pa.Table], path: str) -> int:
+    # Uncompressed Arrow IPC, the format that can be memory-mapped as is.
+    rows = 0
+    tmp_path = f"{path}.tmp"
+    with pa.OSFile(tmp_path, "wb") as sink:
+        with pa.ipc.new_file(sink, CARD_SCHEMA) as writer:
+            for table in tables:
+                writer.write_table(table)
+                rows += table.num_rows
+    os.replace(tmp_path, path)
+    return rows
+
+
+class ParquetDatasetSink(DatasetSink):
+    """Appends cards to a Parquet dataset directory.
+
+    Every commit writes the pending batches as one new part file holding a
+    single row group, under a temporary name that is renamed into place,
+    so readers only ever see complete parts.
+    """
+
+    def __init__(self, path: str, config: SinkConfig = None):
+        self.path = path
+        self.config = config or SinkConfig()
+        self._pending: List[pa.Table] = []
+        os.makedirs(path, exist_ok=True)
+        for tmp_path in glob.glob(os.path.join(path, "*.tmp")):
+            os.remove(tmp_path)
+        # Numbered after the highest existing part, so a removed part never
+        # gets its successor overwritten.
+        self._parts = max(
+            (int(os.path.basename(part)[5:-8]) for part in glob.glob(os.path.join(path, "part-*.parquet"))),
+            default=-1,
+        ) + 1
+
+    @property
+    def pending_batches(self) -> int:
+        return len(self._pending)
+
+    def write(self, rows: List[DatasetRow]):
+        if rows:
+            self.write_table(rows_to_table(rows))
+
+    def write_table(self, table: pa.Table):
+        if not table.num_rows:
+            return
+        self._pending.append(table)
+        if len(self._pending) >= self.config.buffer_batches:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        part_path = os.path.join(self.path, f"part-{self._parts:06d}.parquet")
+        tmp_path = f"{part_path}.tmp"
+        table = pa.concat_tables(self._pending)
+        with open(tmp_path, "wb") as f:
+            pq.write_table(table, f, row_group_size=max(table.num_rows, 1), compression="zstd")
+            f.flush()
+            if self.config.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, part_path)
+        self._parts += 1
+        self._pending = []
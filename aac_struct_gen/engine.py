@@ -0,0 +1,260 @@
+import asyncio
+import random
+import time
+from email.utils import parsedate_to_datetime
+from typing import Any, Dict, List, Optional
+import httpx
+from distilabel.llms.base import AsyncLLM
+from pydantic import PrivateAttr, SecretStr
+from .usage import UsageTracker
+
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+
+class TokenBucket:
+    def __init__(self, per_minute: float, capacity: Optional[float] = None):
+        self.rate = per_minute / 60.0
+        self.capacity = capacity or per_minute
+        self.tokens = self.capacity
+        self.updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    async def acquire(self, amount: float = 1):
+        amount = min(amount, self.capacity)
+        # Holding the lock while sleeping keeps waiters in FIFO order.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                await asyncio.sleep((amount - self.tokens) / self.rate)
+
+    def adjust(self, amount: float):
+        self._refill()
+        self.tokens = min(self.capacity, self.tokens + amount)
+
+    def drain(self):
+        self._refill()
+        self.tokens = min(self.tokens, 0)
+
+
+class RateLimiter:
+    def __init__(self, rpm: Optional[float] = None, tpm: Optional[float] = None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.cooldown_until = 0.0
+
+    async def acquire(self, estimated_tokens: int):
+        while True:
+            wait = self.cooldown_until - time.monotonic()
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        if self.requests:
+            await self.requests.acquire(1)
+        if self.tokens:
+            await self.tokens.acquire(estimated_tokens)
+
+    def settle(self, estimated_tokens: int, actual_tokens: int):
+        if self.tokens:
+            self.tokens.adjust(estimated_tokens - actual_tokens)
+
+    def cool_down(self, seconds: float):
+        self.cooldown_until = max(self.cooldown_until, time.monotonic() + seconds)
+        if self.requests:
+            self.requests.drain()
+
+
+def parse_retry_after(headers: httpx.Headers) -> Optional[float]:
+    value = headers.get("retry-after-ms")
+    if value:
+        try:
+            return float(value) / 1000
+        except ValueError:
+            pass
+    value = headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class ChatCompletionsLLM(AsyncLLM):
+    """OpenAI-compatible chat-completions client with client-side rate limiting.
+
+    At most ``max_concurrency`` requests are in flight, and requests and
+    tokens per minute are shaped with token buckets before anything is sent.
+    429 and 5xx responses are retried, honouring ``Retry-After`` when the
+    server sends it and backing off exponentially with jitter otherwise.
+    Setting ``api_version`` switches to Azure OpenAI deployment URLs.
+    Token usage of every response is recorded in ``usage`` and, with
+    ``usage_log``, appended to a JSONL file.
+    """
+
+    model: str
+    base_url: str = "https://api.openai.com/v1"
+    api_key: Optional[SecretStr] = None
+    api_version: Optional[str] = None
+    max_concurrency: int = 16
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    max_retries: int = 6
+    backoff_base: float = 1.0
+    backoff_max: float = 60.0
+    timeout: float = 120.0
+    usage_log: Optional[str] = None
+
+    _client: Optional[httpx.AsyncClient] = PrivateAttr(None)
+    _semaphore: Optional[asyncio.Semaphore] = PrivateAttr(None)
+    _limiter: Optional[RateLimiter] = PrivateAttr(None)
+    _gauges: Dict[str, int] = PrivateAttr(default_factory=dict)
+    _usage: UsageTracker = PrivateAttr(default_factory=UsageTracker)
+
+    def load(self) -> None:
+        super().load()
+        headers = {}
+        if self.api_key is not None:
+            secret = self.api_key.get_secret_value()
+            if self.api_version:
+                headers["api-key"] = secret
+            else:
+                headers["Authorization"] = f"Bearer {secret}"
+        self._client = httpx.AsyncClient(
+            headers=headers,
+            timeout=self.timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._limiter = RateLimiter(self.rpm, self.tpm)
+        self._usage = UsageTracker(self.usage_log)
+        self._gauges = {
+            "in_flight": 0,
+            "queued": 0,
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "errors": 0,
+        }
+
+    @property
+    def model_name(self) -> str:
+        return self.model
+
+    @property
+    def url(self) -> str:
+        base_url = self.base_url.rstrip("/")
+        if self.api_version:
+            return (
+                f"{base_url}/openai/deployments/{self.model}/chat/completions"
+                f"?api-version={self.api_version}"
+            )
+        return f"{base_url}/chat/completions"
+
+    def gauges(self) -> Dict[str, int]:
+        return dict(self._gauges)
+
+    @property
+    def usage(self) -> UsageTracker:
+        return self._usage
+
+    def _backoff(self, attempt: int, retry_after: Optional[float]) -> float:
+        if retry_after is not None:
+            return retry_after + random.uniform(0, 0.1 * retry_after + 0.05)
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    async def agenerate(  # type: ignore
+        self,
+        input: List[Dict[str, str]],
+        num_generations: int = 1,
+        max_new_tokens: int = 256,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+    ) -> List[Optional[str]]:
+        payload: Dict[str, Any] = {
+            "messages": input,
+            "max_tokens": max_new_tokens,
+            "n": num_generations,
+        }
+        if not self.api_version:
+            payload["model"] = self.model
+        if temperature is not None:
+            payload["temperature"] = temperature
+        if top_p is not None:
+            payload["top_p"] = top_p
+        # Roughly four characters per token; settled against real usage below.
+        estimated_tokens = (
+            sum(len(message["content"]) for message in input) // 4
+            + max_new_tokens * num_generations
+        )
+
+        attempt = 0
+        self._gauges["queued"] += 1
+        try:
+            async with self._semaphore:
+                while True:
+                    await self._limiter.acquire(estimated_tokens)
+                    self._gauges["queued"] -= 1
+                    self._gauges["in_flight"] += 1
+                    self._gauges["requests"] += 1
+                    sent_at = time.monotonic()
+                    try:
+                        response = await self._client.post(self.url, json=payload)
+                    except httpx.TransportError as e:
+                        response = None
+                        error: Exception = e
+                    finally:
+                        self._gauges["in_flight"] -= 1
+                        self._gauges["queued"] += 1
+
+                    if response is not None and response.status_code == 200:
+                        body = response.json()
+                        usage = body.get("usage") or {}
+                        self._limiter.settle(
+                            estimated_tokens,
+                            usage.get("total_tokens", estimated_tokens),
+                        )
+                        if usage:
+                            self._usage.record(
+                                self.model_name, usage, time.monotonic() - sent_at
+                            )
+                        choices = sorted(body["choices"], key=lambda c: c.get("index", 0))
+                        return [choice["message"]["content"] for choice in choices]
+
+                    retry_after = None
+                    if response is not None:
+                        if response.status_code not in RETRYABLE_STATUS:
+                            self._gauges["errors"] += 1
+                            response.raise_for_status()
+                        error = httpx.HTTPStatusError(
+                            f"{response.status_code} from {self.url}",
+                            request=response.request,
+                            response=response,
+                        )
+                        retry_after = parse_retry_after(response.headers)
+                        if response.status_code == 429:
+                            self._gauges["throttled"] += 1
+                            self._limiter.cool_down(
+                                retry_after if retry_after is not None else self.backoff_base
+                            )
+
+                    if attempt >= self.max_retries:
+                        self._gauges["errors"] += 1
+                        raise error
+                    self._gauges["retries"] += 1
+                    await asyncio.sleep(self._backoff(attempt, retry_after))
+                    attempt += 1
+        finally:
+            self._gauges["queued"] -= 1
@@ -0,0 +1,190 @@
+import asyncio
+import hashlib
+import json
+import random
+import re
+import threading
+from typing import Any, Dict, List, Optional, Set
+from distilabel.llms.base import AsyncLLM
+from pydantic import PrivateAttr
+from .prompts import PACKED_CARD_HEADER
+from .usage import UsageTracker
+
+
+CARD_TEMPLATES = [
+    ("Quero {w}", "eu quero {w}", "🙂"),
+    ("Gosto de {w}", "eu gosto de {w}", "😀"),
+    ("Preciso de {w}", "eu preciso de {w}", "🙏"),
+    ("Onde está {w}?", "onde está {w}?", "❓"),
+    ("Não quero {w}", "eu não quero {w}", "🚫"),
+    ("Mostrar {w}", "me mostre {w}", "👀"),
+    ("Ajuda com {w}", "me ajude com {w}", "🆘"),
+    ("Mais {w}", "eu quero mais {w}", "➕"),
+]
+
+SYNONYM_WORDS = ["casa", "bola", "água", "comida", "escola", "amigo", "cama", "mamãe"]
+
+
+def request_rng(seed: int, messages: List[Dict[str, str]]) -> random.Random:
+    digest = hashlib.sha256(
+        repr((seed, [message["content"] for message in messages])).encode("utf-8")
+    ).digest()
+    return random.Random(int.from_bytes(digest[:8], "big"))
+
+
+def extract_word(prompt: str) -> str:
+    match = re.search(r"input: (.*)", prompt) or re.search(r": (.*)$", prompt)
+    return match.group(1).strip() if match else prompt.strip()
+
+
+def synthetic_options(word: str, rng: random.Random) -> List[str]:
+    return [
+        f"{text.format(w=word)}, {spoken.format(w=word)}, {emoji}"
+        for text, spoken, emoji in rng.sample(CARD_TEMPLATES, 5)
+    ]
+
+
+def synthetic_card(word: str, rng: random.Random) -> str:
+    return f"input: {word}\noutput: " + "\n".join(synthetic_options(word, rng))
+
+
+def synthetic_packed_cards(prompt: str, rng: random.Random) -> str:
+    words = json.loads(prompt.rsplit("Words: ", 1)[1])
+    cards = [{"input": word, "output": synthetic_options(word, rng)} for word in words]
+    return json.dumps(cards, ensure_ascii=False)
+
+
+def synthetic_synonyms(word: str, rng: random.Random) -> str:
+    return f"{word} agora, quero {word}, {rng.choice(SYNONYM_WORDS)}"
+
+
+def synthetic_reply(messages: List[Dict[str, str]], rng: random.Random) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    if prompt.startswith(PACKED_CARD_HEADER):
+        return synthetic_packed_cards(prompt, rng)
+    word = extract_word(prompt)
+    if prompt.startswith("Generate synonyms"):
+        return synthetic_synonyms(word, rng)
+    return synthetic_card(word, rng)
+
+
+class PrefixCache:
+    """Emulates provider prompt caching for synthetic usage.
+
+    Like the OpenAI cache, only prefixes of at least ``min_tokens`` count
+    and hits are rounded down to ``block_tokens``. The cached prefix here is
+    the system message, counted at four characters per token.
+    """
+
+    def __init__(self, min_tokens: int = 1024, block_tokens: int = 128):
+        self.min_tokens = min_tokens
+        self.block_tokens = block_tokens
+        self._seen: Set[str] = set()
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, messages: List[Dict[str, str]]) -> int:
+        if not messages or messages[0].get("role") != "system":
+            return 0
+        prefix = messages[0]["content"]
+        tokens = len(prefix) // 4
+        if tokens < self.min_tokens:
+            return 0
+        with self._lock:
+            if prefix not in self._seen:
+                self._seen.add(prefix)
+                return 0
+        return tokens - tokens % self.block_tokens
+
+
+def synthetic_usage(
+    messages: List[Dict[str, str]], content: str, prefix_cache: Optional[PrefixCache] = None
+) -> Dict[str, Any]:
+    prompt_tokens = sum(len(m.get("content", "")) for m in messages) // 4
+    completion_tokens = len(content) // 4
+    cached_tokens = prefix_cache.cached_tokens(messages) if prefix_cache else 0
+    return {
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "total_tokens": prompt_tokens + completion_tokens,
+        "prompt_tokens_details": {"cached_tokens": cached_tokens},
+    }
+
+
+class FakeLLM(AsyncLLM):
+    """Deterministic offline stand-in for ``OpenAILLM``.
+
+    Replies with synthetic cards or synonyms derived from the request, so
+    the same request always yields the same text for a given ``seed``.
+    Latency is drawn from ``latency_distribution`` ("constant", "uniform",
+    "exponential" or "lognormal") around ``latency``, plus ``token_latency``
+    seconds per completion token; ``failure_rate`` of
+    the requests raise and ``malformed_rate`` return text without the
+    card format. Token usage is estimated and recorded in ``usage``.
+    """
+
+    seed: int = 0
+    latency: float = 0.0
+    latency_distribution: str = "constant"
+    latency_sigma: float = 0.5
+    token_latency: float = 0.0
+    failure_rate: float = 0.0
+    malformed_rate: float = 0.0
+
+    _usage: UsageTracker = PrivateAttr(default_factory=UsageTracker)
+    _prefix_cache: PrefixCache = PrivateAttr(default_factory=PrefixCache)
+
+    def load(self) -> None:
+        super().load()
+
+    @property
+    def usage(self) -> UsageTracker:
+        return self._usage
+
+    @property
+    def model_name(self) -> str:
+        return f"fake-{self.seed}"
+
+    def sample_latency(self, rng: random.Random) -> float:
+        if self.latency <= 0:
+            return 0.0
+        if self.latency_distribution == "uniform":
+            return rng.uniform(0, 2 * self.latency)
+        if self.latency_distribution == "exponential":
+            return rng.expovariate(1 / self.latency)
+        if self.latency_distribution == "lognormal":
+            return self.latency * rng.lognormvariate(0, self.latency_sigma)
+        return self.latency
+
+    async def agenerate(  # type: ignore
+        self,
+        input: List[Dict[str, str]],
+        num_generations: int = 1,
+        max_new_tokens: int = 256,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+    ) -> List[Optional[str]]:
+        rng = request_rng(self.seed, input)
+        delay = self.sample_latency(rng)
+        if rng.random() < self.failure_rate:
+            if delay:
+                await asyncio.sleep(delay)
+            raise RuntimeError("FakeLLM injected failure")
+        if rng.random() < self.malformed_rate:
+            replies = ["Desculpe, não consegui gerar o cartão." for _ in range(num_generations)]
+        else:
+            replies = [synthetic_reply(input, rng) for _ in range(num_generations)]
+        usage = synthetic_usage(input, "".join(replies), self._prefix_cache)
+        delay += self.token_latency * usage["completion_tokens"]
+        if delay:
+            await asyncio.sleep(delay)
+        self._usage.record(self.model_name, usage, delay)
+        return replies
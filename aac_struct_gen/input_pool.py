@@ -0,0 +1,160 @@
+import io
+import os
+import random
+import sqlite3
+from typing import Dict, Iterable, List, Optional, Tuple
+import pandas as pd
+from .sinks import DATASET_COLUMNS, read_committed_size
+from .text import normalize_word
+
+
+def read_new_inputs(dataset_path: str, offset: int = 0) -> Tuple[List[str], Optional[int]]:
+    """Inputs of the CSV rows committed after byte ``offset``.
+
+    Returns the inputs and the committed size to pass as the next offset,
+    or ``None`` as the size when the file does not exist.
+    """
+    if not os.path.exists(dataset_path):
+        return [], None
+    size = read_committed_size(dataset_path)
+    if size is None:
+        size = os.path.getsize(dataset_path)
+    if size < offset:
+        # The file was replaced; read it again from the start.
+        offset = 0
+    if size == offset:
+        return [], size
+    with open(dataset_path, "rb") as f:
+        f.seek(offset)
+        data = f.read(size - offset)
+    frame = pd.read_csv(
+        io.BytesIO(data),
+        dtype=str,
+        keep_default_na=False,
+        header=0 if offset == 0 else None,
+        names=None if offset == 0 else DATASET_COLUMNS,
+    )
+    return frame["input"].tolist() if len(frame) else [], size
+
+
+class InputPool:
+    """Persistent pool of dataset inputs for sampling expansion seeds.
+
+    Inputs are grouped into buckets by how often they have been expanded.
+    A sample picks a bucket with probability proportional to its size times
+    ``1 / (1 + expansions) ** alpha`` and then a uniform member of it, so
+    sampling and updates cost the same however large the pool gets; only
+    the handful of distinct expansion counts is scanned.
+    """
+
+    def __init__(self, path: str = ":memory:", alpha: float = 1.0, seed: Optional[int] = None):
+        self.alpha = alpha
+        self.random = random.Random(seed)
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS inputs (
+                key TEXT PRIMARY KEY,
+                input TEXT NOT NULL,
+                expansions INTEGER NOT NULL DEFAULT 0
+            )"""
+        )
+        self.conn.execute("CREATE TABLE IF NOT EXISTS offsets (path TEXT PRIMARY KEY, size INTEGER)")
+        self.conn.commit()
+        self._inputs: Dict[str, str] = {}
+        self._levels: Dict[str, int] = {}
+        self._buckets: Dict[int, List[str]] = {}
+        self._positions: Dict[str, int] = {}
+        for key, text, expansions in self.conn.execute("SELECT key, input, expansions FROM inputs"):
+            self._inputs[key] = text
+            self._place(key, expansions)
+
+    def __len__(self) -> int:
+        return len(self._inputs)
+
+    def _place(self, key: str, level: int):
+        bucket = self._buckets.setdefault(level, [])
+        self._levels[key] = level
+        self._positions[key] = len(bucket)
+        bucket.append(key)
+
+    def _remove(self, key: str):
+        # Swap with the last member so removal stays O(1).
+        level = self._levels.pop(key)
+        bucket = self._buckets[level]
+        position = self._positions.pop(key)
+        last = bucket.pop()
+        if last != key:
+            bucket[position] = last
+            self._positions[last] = position
+        if not bucket:
+            del self._buckets[level]
+
+    def weight(self, expansions: int) -> float:
+        return 1.0 / (1 + expansions) ** self.alpha
+
+    def add(self, texts: Iterable[str]) -> int:
+        new = []
+        for text in texts:
+            key = normalize_word(text)
+            if key and key not in self._inputs:
+                self._inputs[key] = text
+                self._place(key, 0)
+                new.append((key, text))
+        self.conn.executemany("INSERT OR IGNORE INTO inputs (key, input) VALUES (?, ?)", new)
+        self.conn.commit()
+        return len(new)
+
+    def sync(self, dataset_path: str) -> int:
+        # Reads only the rows committed since the previous sync.
+        row = self.conn.execute(
+            "SELECT size FROM offsets WHERE path = ?", (dataset_path,)
+        ).fetchone()
+        inputs, size = read_new_inputs(dataset_path, row[0] if row else 0)
+        if size is None:
+            return 0
+        added = self.add(inputs)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO offsets (path, size) VALUES (?, ?)", (dataset_path, size)
+        )
+        self.conn.commit()
+        return added
+
+    def _draw(self) -> str:
+        weights = [(level, len(bucket) * self.weight(level)) for level, bucket in self._buckets.items()]
+        target = self.random.random() * sum(weight for _, weight in weights)
+        for level, weight in weights:
+            target -= weight
+            if target < 0:
+                break
+        return self.random.choice(self._buckets[level])
+
+    def sample(self, k: int) -> List[str]:
+        # Without replacement: drawn keys leave their bucket until the end.
+        drawn = []
+        for _ in range(min(k, len(self._inputs))):
+            key = self._draw()
+            drawn.append((key, self._levels[key]))
+            self._remove(key)
+        for key, level in drawn:
+            self._place(key, level)
+        return [self._inputs[key] for key, _ in drawn]
+
+    def mark_expanded(self, texts: Iterable[str]):
+        updates = []
+        for text in texts:
+            key = normalize_word(text)
+            if key in self._levels:
+                level = self._levels[key] + 1
+                self._remove(key)
+                self._place(key, level)
+                updates.append((level, key))
+        self.conn.executemany("UPDATE inputs SET expansions = ? WHERE key = ?", updates)
+        self.conn.commit()
+
+    def coverage(self) -> Dict[int, int]:
+        return {level: len(bucket) for level, bucket in sorted(self._buckets.items())}
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,175 @@
+import argparse
+import json
+import random
+import threading
+import time
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from .fakes import PrefixCache, request_rng, synthetic_reply, synthetic_usage
+
+
+class MockChatServer:
+    """Local stand-in for the OpenAI chat-completions endpoint.
+
+    Replies after ``latency`` (+ up to ``jitter``) seconds. A request is
+    answered with 429 and ``Retry-After: retry_after`` either at random
+    with probability ``throttle_rate`` or once ``rpm_limit`` requests have
+    been accepted in the last minute. Usage reports ``cached_tokens`` for
+    repeated system prompts the way provider prompt caching does.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.05,
+        jitter: float = 0.0,
+        throttle_rate: float = 0.0,
+        rpm_limit: Optional[int] = None,
+        retry_after: float = 1.0,
+        seed: Optional[int] = None,
+    ):
+        self.latency = latency
+        self.jitter = jitter
+        self.throttle_rate = throttle_rate
+        self.rpm_limit = rpm_limit
+        self.retry_after = retry_after
+        self.seed = seed or 0
+        self.random = random.Random(seed)
+        self.stats = {"requests": 0, "throttled": 0, "completed": 0}
+        self.prefix_cache = PrefixCache()
+        self._arrivals = deque()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.httpd = ThreadingHTTPServer((host, port), self._handler())
+        self.httpd.daemon_threads = True
+
+    @property
+    def base_url(self) -> str:
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}/v1"
+
+    def reply(self, messages: List[Dict[str, str]]) -> str:
+        return synthetic_reply(messages, request_rng(self.seed, messages))
+
+    def _should_throttle(self) -> bool:
+        with self._lock:
+            now = time.monotonic()
+            self.stats["requests"] += 1
+            while self._arrivals and now - self._arrivals[0] > 60:
+                self._arrivals.popleft()
+            if self.rpm_limit is not None and len(self._arrivals) >= self.rpm_limit:
+                return True
+            if self.random.random() < self.throttle_rate:
+                return True
+            self._arrivals.append(now)
+            return False
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"
+
+            def log_message(self, format, *args):
+                pass
+
+            def _send(self, status: int, body: dict, headers: Dict[str, str] = None):
+                data = json.dumps(body, ensure_ascii=False).encode("utf-8")
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                for key, value in (headers or {}).items():
+                    self.send_header(key, value)
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_POST(self):
+                length = int(self.headers.get("Content-Length", 0))
+                payload = json.loads(self.rfile.read(length) or b"{}")
+                if not self.path.split("?")[0].endswith("/chat/completions"):
+                    self._send(404, {"error": {"message": "not found"}})
+                    return
+                if server._should_throttle():
+                    with server._lock:
+                        server.stats["throttled"] += 1
+                    self._send(
+                        429,
+                        {"error": {"message": "Rate limit reached", "type": "rate_limit"}},
+                        {"Retry-After": str(server.retry_after)},
+                    )
+                    return
+
+                time.sleep(server.latency + server.random.uniform(0, server.jitter))
+                messages = payload.get("messages", [])
+                content = server.reply(messages)
+                usage = synthetic_usage(messages, content, server.prefix_cache)
+                with server._lock:
+                    server.stats["completed"] += 1
+                self._send(
+                    200,
+                    {
+                        "id": "chatcmpl-mock",
+                        "object": "chat.completion",
+                        "created": int(time.time()),
+                        "model": payload.get("model", "mock"),
+                        "choices": [
+                            {
+                                "index": index,
+                                "message": {"role": "assistant", "content": content},
+                                "finish_reason": "stop",
+                            }
+                            for index in range(payload.get("n", 1))
+                        ],
+                        "usage": usage,
+                    },
+                )
+
+        return Handler
+
+    def start(self) -> "MockChatServer":
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.stop()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock OpenAI chat-completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--latency", type=float, default=0.05)
+    parser.add_argument("--jitter", type=float, default=0.0)
+    parser.add_argument("--throttle-rate", type=float, default=0.0)
+    parser.add_argument("--rpm-limit", type=int, default=None)
+    parser.add_argument("--retry-after", type=float, default=1.0)
+    args = parser.parse_args()
+
+    server = MockChatServer(
+        args.host,
+        args.port,
+        latency=args.latency,
+        jitter=args.jitter,
+        throttle_rate=args.throttle_rate,
+        rpm_limit=args.rpm_limit,
+        retry_after=args.retry_after,
+    )
+    print(f"Serving mock chat completions on {server.base_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
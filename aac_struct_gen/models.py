@@ -5,11 +5,16 @@ from typing import List
 class SynonymRequest(BaseModel):
     system_prompt: str
     instruction: str
+    input: str = ""
 
 
 class CardRequest(BaseModel):
     system_prompt: str
     instruction: str
+    input: str = ""
+    # Retries share one instruction, so the attempt keeps their cache
+    # entries apart.
+    attempt: int = 0
 
 
 class SynonymResponse(BaseModel):
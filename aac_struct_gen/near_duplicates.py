@@ -0,0 +1,272 @@
+import hashlib
+import json
+import sqlite3
+import zlib
+from typing import Dict, Iterable, List, Optional, Tuple
+import numpy as np
+from .text import clean_text
+from .models import DatasetRow
+from .sinks import DatasetSink
+
+
+MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+MAX_HASH = np.uint64((1 << 32) - 1)
+
+
+def shingles(text: str, size: int = 2) -> List[str]:
+    words = (clean_text(text) or "").split()
+    if len(words) <= size:
+        return [" ".join(words)]
+    return [" ".join(words[i:i + size]) for i in range(len(words) - size + 1)]
+
+
+def lsh_params(num_perm: int, threshold: float) -> Tuple[int, int]:
+    # Pick the (bands, rows) split whose S-curve midpoint is closest to the
+    # requested similarity threshold.
+    best = None
+    for rows in range(1, num_perm + 1):
+        if num_perm % rows:
+            continue
+        bands = num_perm // rows
+        midpoint = (1 / bands) ** (1 / rows)
+        if best is None or abs(midpoint - threshold) < best[0]:
+            best = (abs(midpoint - threshold), bands, rows)
+    return best[1], best[2]
+
+
+def row_key(row: DatasetRow) -> str:
+    return hashlib.sha1(f"{row.input}\x1f{row.output}".encode("utf-8")).hexdigest()
+
+
+class NearDuplicateIndex:
+    """MinHash + LSH index over card outputs, persisted in SQLite.
+
+    Outputs are normalized with ``clean_text`` and split into word
+    shingles. Each signature is cut into LSH bands; rows that share a band
+    bucket are candidates, and only candidates are compared, so lookups do
+    not scale with the size of the index.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        num_perm: int = 64,
+        threshold: float = 0.8,
+        shingle_size: int = 2,
+        seed: int = 1,
+    ):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS signatures (
+                id INTEGER PRIMARY KEY,
+                row_key TEXT UNIQUE NOT NULL,
+                input TEXT,
+                signature BLOB NOT NULL
+            )"""
+        )
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS buckets (band INTEGER, key INTEGER, id INTEGER)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS buckets_lookup ON buckets (band, key)")
+
+        params = {
+            "num_perm": num_perm,
+            "threshold": threshold,
+            "shingle_size": shingle_size,
+            "seed": seed,
+        }
+        stored = self.conn.execute("SELECT value FROM meta WHERE key = 'params'").fetchone()
+        if stored:
+            # An existing index keeps the parameters it was built with.
+            params = json.loads(stored[0])
+        else:
+            self.conn.execute(
+                "INSERT INTO meta (key, value) VALUES ('params', ?)", (json.dumps(params),)
+            )
+        self.conn.commit()
+
+        self.num_perm = params["num_perm"]
+        self.threshold = params["threshold"]
+        self.shingle_size = params["shingle_size"]
+        self.bands, self.rows = lsh_params(self.num_perm, self.threshold)
+        rng = np.random.RandomState(params["seed"])
+        self._a = rng.randint(1, MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+        self._b = rng.randint(0, MERSENNE_PRIME, size=self.num_perm, dtype=np.uint64)
+
+    def signature(self, text: str) -> np.ndarray:
+        hashes = np.array(
+            [zlib.crc32(shingle.encode("utf-8")) for shingle in shingles(text, self.shingle_size)],
+            dtype=np.uint64,
+        )
+        permuted = (hashes[:, None] * self._a + self._b) % MERSENNE_PRIME & MAX_HASH
+        return permuted.min(axis=0).astype(np.uint32)
+
+    def band_keys(self, signature: np.ndarray) -> List[int]:
+        return [
+            int.from_bytes(
+                hashlib.blake2b(band.tobytes(), digest_size=8).digest(), "big", signed=True
+            )
+            for band in signature[: self.bands * self.rows].reshape(self.bands, self.rows)
+        ]
+
+    @staticmethod
+    def similarity(left: np.ndarray, right: np.ndarray) -> float:
+        return float(np.mean(left == right))
+
+    def query(self, signature: np.ndarray) -> List[Tuple[int, float]]:
+        candidates = set()
+        for band, key in enumerate(self.band_keys(signature)):
+            candidates.update(
+                row_id
+                for (row_id,) in self.conn.execute(
+                    "SELECT id FROM buckets WHERE band = ? AND key = ?", (band, key)
+                )
+            )
+        matches = []
+        for row_id in candidates:
+            (blob,) = self.conn.execute(
+                "SELECT signature FROM signatures WHERE id = ?", (row_id,)
+            ).fetchone()
+            score = self.similarity(signature, np.frombuffer(blob, dtype=np.uint32))
+            if score >= self.threshold:
+                matches.append((row_id, score))
+        return matches
+
+    def add(self, row: DatasetRow, signature: Optional[np.ndarray] = None) -> Optional[int]:
+        if signature is None:
+            signature = self.signature(row.output)
+        cursor = self.conn.execute(
+            "INSERT OR IGNORE INTO signatures (row_key, input, signature) VALUES (?, ?, ?)",
+            (row_key(row), row.input, signature.tobytes()),
+        )
+        if not cursor.rowcount:
+            return None
+        row_id = cursor.lastrowid
+        self.conn.executemany(
+            "INSERT INTO buckets (band, key, id) VALUES (?, ?, ?)",
+            [(band, key, row_id) for band, key in enumerate(self.band_keys(signature))],
+        )
+        return row_id
+
+    def commit(self):
+        self.conn.commit()
+
+    def split(self, rows: Iterable[DatasetRow]) -> Tuple[List[Tuple[DatasetRow, np.ndarray]], List[DatasetRow]]:
+        # Rows are checked against the index and against earlier rows of
+        # the same call; nothing is added to the index here.
+        kept: List[Tuple[DatasetRow, np.ndarray]] = []
+        dropped: List[DatasetRow] = []
+        for row in rows:
+            signature = self.signature(row.output)
+            if self.query(signature) or any(
+                self.similarity(signature, other) >= self.threshold for _, other in kept
+            ):
+                dropped.append(row)
+            else:
+                kept.append((row, signature))
+        return kept, dropped
+
+    def clusters(self) -> List[List[int]]:
+        parent: Dict[int, int] = {}
+
+        def find(row_id: int) -> int:
+            parent.setdefault(row_id, row_id)
+            while parent[row_id] != row_id:
+                parent[row_id] = parent[parent[row_id]]
+                row_id = parent[row_id]
+            return row_id
+
+        signatures: Dict[int, np.ndarray] = {}
+
+        def load(row_id: int) -> np.ndarray:
+            if row_id not in signatures:
+                (blob,) = self.conn.execute(
+                    "SELECT signature FROM signatures WHERE id = ?", (row_id,)
+                ).fetchone()
+                signatures[row_id] = np.frombuffer(blob, dtype=np.uint32)
+            return signatures[row_id]
+
+        for (ids,) in self.conn.execute(
+            "SELECT group_concat(id) FROM buckets GROUP BY band, key HAVING COUNT(*) > 1"
+        ):
+            # Members are compared with the bucket's first row only, so a
+            # large templated bucket costs O(m) comparisons, not O(m^2).
+            representative, *members = [int(row_id) for row_id in ids.split(",")]
+            for member in members:
+                if find(representative) != find(member) and (
+                    self.similarity(load(representative), load(member)) >= self.threshold
+                ):
+                    parent[find(member)] = find(representative)
+
+        groups: Dict[int, List[int]] = {}
+        for row_id in parent:
+            groups.setdefault(find(row_id), []).append(row_id)
+        return sorted(
+            (sorted(members) for members in groups.values() if len(members) > 1),
+            key=lambda members: (-len(members), members[0]),
+        )
+
+    def inputs(self, row_ids: Iterable[int]) -> List[str]:
+        return [
+            self.conn.execute("SELECT input FROM signatures WHERE id = ?", (row_id,)).fetchone()[0]
+            for row_id in row_ids
+        ]
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class NearDuplicateFilterSink(DatasetSink):
+    """Drops rows that are near-duplicates of already written ones.
+
+    Kept rows enter the index only after the wrapped sink has committed
+    them, so an interrupted run never leaves the index ahead of the data.
+    """
+
+    def __init__(self, sink: DatasetSink, index: NearDuplicateIndex):
+        self.sink = sink
+        self.index = index
+        self.dropped = 0
+        self._unindexed: List[Tuple[DatasetRow, np.ndarray]] = []
+
+    @property
+    def pending_batches(self) -> int:
+        return self.sink.pending_batches
+
+    def write(self, rows: List[DatasetRow]):
+        candidates, dropped = self.index.split(rows)
+        kept = []
+        for row, signature in candidates:
+            # Rows accepted earlier but not yet committed are not in the
+            # index yet, so they are checked here.
+            if any(
+                self.index.similarity(signature, other) >= self.index.threshold
+                for _, other in self._unindexed
+            ):
+                dropped.append(row)
+            else:
+                kept.append((row, signature))
+        self.dropped += len(dropped)
+        self._unindexed.extend(kept)
+        self.sink.write([row for row, _ in kept])
+        if not self.sink.pending_batches:
+            self._index_committed()
+
+    def _index_committed(self):
+        for row, signature in self._unindexed:
+            self.index.add(row, signature)
+        self.index.commit()
+        self._unindexed = []
+
+    def flush(self):
+        self.sink.flush()
+        self._index_committed()
+
+    def close(self):
+        self.sink.close()
+        self._index_committed()
+        if self.dropped:
+            print(f"Dropped {self.dropped} near-duplicate rows")
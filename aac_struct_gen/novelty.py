@@ -0,0 +1,123 @@
+import difflib
+import sqlite3
+import time
+from typing import Dict, Iterable, List, Optional, Set
+from .text import clean_text
+
+
+def light_stem(token: str) -> str:
+    # Folds the most common Portuguese plural endings, which is enough to
+    # treat "brinquedo"/"brinquedos" or "flor"/"flores" as the same word.
+    if len(token) > 4 and token.endswith("oes"):
+        return token[:-3] + "ao"
+    if len(token) > 4 and token.endswith("es") and token[-3] in "rsz":
+        return token[:-2]
+    if len(token) > 3 and token.endswith("s"):
+        return token[:-1]
+    return token
+
+
+class NoveltyIndex:
+    """Persistent set of already generated texts, compared by normalized form.
+
+    Texts are accent- and case-folded with ``clean_text``; with ``stem``
+    each token is also lightly stemmed. With ``fuzzy_threshold`` a text
+    whose normalized form is at least that similar to a known one (same
+    first letters, ``difflib`` ratio) is treated as a repeat too.
+    """
+
+    def __init__(
+        self,
+        path: str = ":memory:",
+        stem: bool = True,
+        fuzzy_threshold: Optional[float] = 0.9,
+    ):
+        self.stem = stem
+        self.fuzzy_threshold = fuzzy_threshold
+        self.conn = sqlite3.connect(path)
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS texts (
+                key TEXT PRIMARY KEY,
+                text TEXT NOT NULL,
+                created_at REAL NOT NULL
+            )"""
+        )
+        self.conn.commit()
+        self.keys: Set[str] = set()
+        self.recent: List[str] = []
+        self._by_prefix: Dict[str, List[str]] = {}
+        self._by_token: Dict[str, List[str]] = {}
+        for key, text in self.conn.execute("SELECT key, text FROM texts ORDER BY created_at"):
+            self._remember(key, text)
+
+    def normalize(self, text: str) -> str:
+        tokens = (clean_text(text) or "").split()
+        if self.stem:
+            tokens = [light_stem(token) for token in tokens]
+        return " ".join(tokens)
+
+    def _remember(self, key: str, text: str):
+        self.keys.add(key)
+        self.recent.append(text)
+        self._by_prefix.setdefault(key[:3], []).append(key)
+        for token in set(key.split()):
+            self._by_token.setdefault(token, []).append(text)
+
+    def __len__(self) -> int:
+        return len(self.keys)
+
+    def is_new(self, text: str) -> bool:
+        key = self.normalize(text)
+        if not key or key in self.keys:
+            return False
+        if self.fuzzy_threshold is None:
+            return True
+        return not difflib.get_close_matches(
+            key, self._by_prefix.get(key[:3], []), n=1, cutoff=self.fuzzy_threshold
+        )
+
+    def add(self, text: str) -> bool:
+        if not self.is_new(text):
+            return False
+        key = self.normalize(text)
+        self.conn.execute(
+            "INSERT OR IGNORE INTO texts (key, text, created_at) VALUES (?, ?, ?)",
+            (key, text, time.time()),
+        )
+        self._remember(key, text)
+        return True
+
+    def filter_new(self, texts: Iterable[str]) -> List[str]:
+        new = [text for text in texts if self.add(text)]
+        self.conn.commit()
+        return new
+
+    def related(self, inputs: Iterable[str], limit: int = 20) -> List[str]:
+        # The most recent known texts sharing a token with the inputs, then
+        # the most recent overall, never more than ``limit``.
+        selected: List[str] = []
+        seen = set()
+        tokens = {
+            token
+            for text in inputs
+            for token in self.normalize(text).split()
+            if len(token) > 3
+        }
+        for token in sorted(tokens):
+            for text in reversed(self._by_token.get(token, [])):
+                if len(selected) >= limit:
+                    return selected
+                if text not in seen:
+                    seen.add(text)
+                    selected.append(text)
+        for text in reversed(self.recent):
+            if len(selected) >= limit:
+                break
+            if text not in seen:
+                seen.add(text)
+                selected.append(text)
+        return selected
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
@@ -0,0 +1,146 @@
+import time
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Tuple
+from .models import CardRequest, CardResponse, SynonymRequest
+
+# Synonyms a single synonym request is expected to add to the queue.
+SYNONYMS_PER_REQUEST = 3
+
+
+class StageMeter:
+    """Wall-clock time during which a stage had at least one request out."""
+
+    def __init__(self):
+        self.requests = 0
+        self.in_flight = 0
+        self.busy_seconds = 0.0
+        self._busy_since = 0.0
+
+    def start(self):
+        if not self.in_flight:
+            self._busy_since = time.perf_counter()
+        self.in_flight += 1
+        self.requests += 1
+
+    def finish(self):
+        self.in_flight -= 1
+        if not self.in_flight:
+            self.busy_seconds += time.perf_counter() - self._busy_since
+
+
+class OverlappedExpansion:
+    """Runs the synonym and card stages of generate_structs concurrently.
+
+    Both stages share one ``GenerationStream``: synonyms are requested while
+    the queue of words waiting for cards (plus what in-flight synonym
+    requests will add) is below ``queue_size``, and queued words are turned
+    into card requests as soon as a slot frees up. A full queue stops new
+    synonym requests, which is the backpressure; ``stop`` stops taking new
+    seeds and lets everything already queued or in flight finish.
+    """
+
+    def __init__(
+        self,
+        service,
+        synonym_prompt: Callable[[List[str]], str],
+        card_prompt: str,
+        queue_size: int = 32,
+    ):
+        self.service = service
+        self.synonym_prompt = synonym_prompt
+        self.card_prompt = card_prompt
+        self.queue_size = queue_size
+        self.queue: Deque[Tuple[str, int]] = deque()
+        self.synonyms = StageMeter()
+        self.cards = StageMeter()
+        self.stopped = False
+        self._attempts: Dict[str, int] = {}
+        self._started_at: Optional[float] = None
+        self._finished_at: Optional[float] = None
+
+    def stop(self):
+        self.stopped = True
+
+    def _requests(self, seeds: Iterator[List[str]]):
+        seed_words: Deque[Tuple[str, str]] = deque()
+        seeds_left = True
+        while True:
+            can_produce = not self.stopped and (bool(seed_words) or seeds_left)
+            backlog = len(self.queue) + SYNONYMS_PER_REQUEST * self.synonyms.in_flight
+            produce = can_produce and backlog < self.queue_size
+            if not produce and not self.queue and not self.synonyms.in_flight and not self.cards.in_flight:
+                # Nothing queued or in flight: keep producing, or finish.
+                if not can_produce:
+                    return
+                produce = True
+
+            if produce:
+                if not seed_words:
+                    inputs = next(seeds, None)
+                    if inputs is None:
+                        seeds_left = False
+                        continue
+                    prompt = self.synonym_prompt(inputs)
+                    seed_words.extend((word, prompt) for word in inputs)
+                    continue
+                word, prompt = seed_words.popleft()
+                self.synonyms.start()
+                yield self.service.synonym_request(word, prompt)
+            elif self.queue:
+                word, attempt = self.queue.popleft()
+                self._attempts[word] = attempt
+                self.cards.start()
+                yield self.service.card_request(word, self.card_prompt, attempt)
+            else:
+                yield None
+
+    def _parse(self, request, generated_text: str) -> Any:
+        if isinstance(request, CardRequest):
+            return self.service.parse_card(request, generated_text)
+        return self.service.parse_synonyms(request, generated_text)
+
+    def run(
+        self,
+        seeds: Iterable[List[str]],
+        accept: Callable[[List[str]], List[str]],
+        expanded: Callable[[List[str]], None],
+    ) -> Iterator[Tuple[str, Optional[CardResponse]]]:
+        # ``accept`` filters new synonyms before they are queued and
+        # ``expanded`` is told which seed inputs got synonyms.
+        self._started_at = time.perf_counter()
+        try:
+            for request, parsed in self.service.stream_generations(
+                self._requests(iter(seeds)), {"max_new_tokens": 256}, self._parse
+            ):
+                if isinstance(request, SynonymRequest):
+                    self.synonyms.finish()
+                    if parsed is not None:
+                        expanded([request.input])
+                        self.queue.extend((word, 0) for word in accept(parsed.synonyms))
+                    continue
+                self.cards.finish()
+                attempt = self._attempts.pop(request.input, 0)
+                if parsed is None and attempt < self.service.card_retries:
+                    self.service.count("card_retries")
+                    self.queue.appendleft((request.input, attempt + 1))
+                    continue
+                if parsed is not None:
+                    self.service.count("cards")
+                yield request.input, parsed
+        finally:
+            self._finished_at = time.perf_counter()
+
+    def report(self) -> Dict[str, float]:
+        wall = (self._finished_at or time.perf_counter()) - (self._started_at or time.perf_counter())
+        slowest = max(self.synonyms.busy_seconds, self.cards.busy_seconds)
+        return {
+            "wall_seconds": wall,
+            "synonym_requests": self.synonyms.requests,
+            "synonym_busy_seconds": self.synonyms.busy_seconds,
+            "synonym_utilization": self.synonyms.busy_seconds / wall if wall else 0.0,
+            "card_requests": self.cards.requests,
+            "card_busy_seconds": self.cards.busy_seconds,
+            "card_utilization": self.cards.busy_seconds / wall if wall else 0.0,
+            # 1.0 means the run took no longer than its slowest stage alone.
+            "overlap_efficiency": slowest / wall if wall else 0.0,
+        }
@@ -0,0 +1,96 @@
+import re
+import unicodedata
+from typing import Iterable, List, Optional, Tuple
+from .models import CardResponse
+
+
+CARD_OPTIONS = 5
+# Symbols, modifiers, variation selectors, keycaps and joiners that make up
+# an emoji sequence.
+EMOJI_CATEGORIES = {"So", "Sk", "Mn", "Me", "Cf"}
+VARIATION_SELECTOR = "\ufe0f"
+KEYCAP = "\u20e3"
+KEYCAP_BASES = "0123456789#*"
+# Emoji planes; code points added after this Python's Unicode version are
+# still unassigned ("Cn") to unicodedata.
+EMOJI_RANGE = range(0x1F000, 0x1FB00)
+OPTION_PREFIX = re.compile(r"^(?:[-*•]\s+|\d+[.)]\s+)")
+OUTPUT_MARKER = re.compile(r"output\s*:", re.IGNORECASE)
+
+
+def emoji_start(line: str) -> Optional[int]:
+    # Index where the trailing emoji sequence starts, or None when the line
+    # does not end in one. Besides "So" symbols, keycaps ("2️⃣") and any
+    # character in emoji presentation ("↔️", "〰️") count as emoji.
+    start = len(line)
+    found = False
+    while start > 0:
+        char = line[start - 1]
+        if char == KEYCAP:
+            base = start - 2
+            if base >= 0 and line[base] == VARIATION_SELECTOR:
+                base -= 1
+            if base < 0 or line[base] not in KEYCAP_BASES:
+                break
+            start, found = base, True
+        elif char == VARIATION_SELECTOR and start > 1 and not (
+            line[start - 2].isspace() or line[start - 2] == ","
+        ):
+            start, found = start - 2, True
+        elif ord(char) in EMOJI_RANGE:
+            start, found = start - 1, True
+        elif unicodedata.category(char) in EMOJI_CATEGORIES:
+            start -= 1
+            found = found or unicodedata.category(char) == "So"
+        else:
+            break
+    return start if found else None
+
+
+def option_parts(line: str) -> Optional[Tuple[str, str, str]]:
+    # "text, spoken_text, emoji" -> its three parts, or None when any of
+    # them is missing.
+    line = OPTION_PREFIX.sub("", line.strip())
+    start = emoji_start(line)
+    if start is None:
+        return None
+    emoji = line[start:]
+    text, _, spoken_text = line[:start].strip().rstrip(",").partition(",")
+    text, spoken_text = text.strip(), spoken_text.strip()
+    if not text or not spoken_text:
+        return None
+    return text, spoken_text, emoji
+
+
+def parse_option(line: str) -> Optional[str]:
+    parts = option_parts(line)
+    return ", ".join(parts) if parts else None
+
+
+def parse_options(lines: Iterable[str]) -> Optional[List[str]]:
+    options = []
+    for line in lines:
+        if not line.strip():
+            continue
+        option = parse_option(line)
+        if option is None or len(options) == CARD_OPTIONS:
+            return None
+        options.append(option)
+    return options if len(options) == CARD_OPTIONS else None
+
+
+def parse_card(word: str, generated_text: str) -> Optional[CardResponse]:
+    # The card is attributed to the requested word, never to whatever the
+    # model echoed after "input:".
+    match = OUTPUT_MARKER.search(generated_text)
+    if match:
+        body = generated_text[match.end():]
+    else:
+        body = "\n".join(
+            line for line in generated_text.splitlines()
+            if not line.strip().lower().startswith("input:")
+        )
+    options = parse_options(body.splitlines())
+    if options is None:
+        return None
+    return CardResponse(input=word, output=options)
@@ -1,13 +1,20 @@
-from typing import List
+import asyncio
+import time
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from distilabel.llms.base import AsyncLLM
 from distilabel.pipeline import Pipeline
 from distilabel.steps import LoadDataFromDicts
 from distilabel.steps.tasks import TextGeneration
 from .models import SynonymRequest, CardRequest
 
 
+EXHAUSTED = object()
+
+
 class SynonymPipeline:
-    def __init__(self, llm):
+    def __init__(self, llm, input_batch_size: int = 8):
         self.llm = llm
+        self.input_batch_size = input_batch_size
 
     def create_pipeline(self, requests: List[SynonymRequest]):
         with Pipeline("SynonymGeneration") as pipeline:
@@ -19,7 +26,7 @@ class SynonymPipeline:
             synonym_generation = TextGeneration(
                 name="synonym_generation",
                 llm=self.llm,
-                input_batch_size=8,
+                input_batch_size=self.input_batch_size,
                 output_mappings={"model_name": "generation_model"},
             )
 
@@ -29,8 +36,9 @@ class SynonymPipeline:
 
 
 class CardPipeline:
-    def __init__(self, llm):
+    def __init__(self, llm, input_batch_size: int = 8):
         self.llm = llm
+        self.input_batch_size = input_batch_size
 
     def create_pipeline(self, requests: List[CardRequest]):
         with Pipeline("CardGeneration") as pipeline:
@@ -42,10 +50,152 @@ class CardPipeline:
             card_generation = TextGeneration(
                 name="card_generation",
                 llm=self.llm,
-                input_batch_size=8,
+                input_batch_size=self.input_batch_size,
                 output_mappings={"model_name": "generation_model"},
             )
 
             load_synonyms >> card_generation
 
         return pipeline
+
+
+class GenerationStream:
+    """Feeds an arbitrarily long request iterator through one loaded LLM.
+
+    Unlike the per-batch pipelines above, the LLM is loaded once and, for
+    async LLMs, up to ``max_in_flight`` requests are kept outstanding across
+    what used to be batch boundaries. Results are yielded as they complete.
+    ``on_request(seconds, ok)`` is called after every LLM call. The request
+    iterator may yield ``None`` to mean "nothing to send right now": the
+    stream then waits for an in-flight result before asking again.
+    """
+
+    def __init__(self, llm, max_in_flight: int = 8):
+        self.llm = llm
+        self.max_in_flight = max_in_flight
+        self.on_request: Optional[Callable[[float, bool], None]] = None
+        self._loaded = False
+
+    def _report(self, start: float, ok: bool):
+        if self.on_request is not None:
+            self.on_request(time.perf_counter() - start, ok)
+
+    def _load(self):
+        if not self._loaded:
+            self.llm.load()
+            self._loaded = True
+
+    @staticmethod
+    def format_messages(request: Union[SynonymRequest, CardRequest]) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": request.system_prompt},
+            {"role": "user", "content": request.instruction},
+        ]
+
+    def run(
+        self,
+        requests: Iterable[Union[SynonymRequest, CardRequest]],
+        generation_kwargs: Dict[str, Any],
+        lookup: Optional[Callable[[Union[SynonymRequest, CardRequest]], Optional[str]]] = None,
+    ) -> Iterator[Tuple[Union[SynonymRequest, CardRequest], Optional[str]]]:
+        self._load()
+        if not isinstance(self.llm, AsyncLLM):
+            yield from self._run_sync(requests, generation_kwargs, lookup)
+            return
+
+        loop = self.llm.event_loop
+        stream = self._run_async(iter(requests), generation_kwargs, lookup)
+        try:
+            while True:
+                try:
+                    item = loop.run_until_complete(stream.__anext__())
+                except StopAsyncIteration:
+                    return
+                yield item
+        finally:
+            loop.run_until_complete(stream.aclose())
+
+    def _run_sync(self, requests, generation_kwargs, lookup):
+        chunk = []
+        for request in requests:
+            if request is None:
+                if chunk:
+                    yield from self._generate_chunk(chunk, generation_kwargs)
+                    chunk = []
+                continue
+            generation = lookup(request) if lookup else None
+            if generation is not None:
+                yield request, generation
+                continue
+            chunk.append(request)
+            if len(chunk) >= self.max_in_flight:
+                yield from self._generate_chunk(chunk, generation_kwargs)
+                chunk = []
+        if chunk:
+            yield from self._generate_chunk(chunk, generation_kwargs)
+
+    def _generate_chunk(self, chunk, generation_kwargs):
+        start = time.perf_counter()
+        try:
+            outputs = self.llm.generate(
+                inputs=[self.format_messages(request) for request in chunk],
+                num_generations=1,
+                **generation_kwargs,
+            )
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            outputs = [[None] for _ in chunk]
+        for request, output in zip(chunk, outputs):
+            generation = output[0] if output else None
+            self._report(start, generation is not None)
+            yield request, generation
+
+    async def _generate_one(self, request, generation_kwargs) -> Optional[str]:
+        start = time.perf_counter()
+        try:
+            output = await self.llm.agenerate(
+                input=self.format_messages(request),
+                num_generations=1,
+                **generation_kwargs,
+            )
+        except Exception as e:
+            print(f"Error: {str(e)}")
+            self._report(start, False)
+            return None
+        generation = output[0] if output else None
+        self._report(start, generation is not None)
+        return generation
+
+    async def _run_async(self, requests, generation_kwargs, lookup):
+        in_flight: Dict[asyncio.Future, Union[SynonymRequest, CardRequest]] = {}
+        exhausted = False
+        try:
+            while True:
+                while not exhausted and len(in_flight) < self.max_in_flight:
+                    request = next(requests, EXHAUSTED)
+                    if request is EXHAUSTED:
+                        exhausted = True
+                        break
+                    if request is None:
+                        break
+                    generation = lookup(request) if lookup else None
+                    if generation is not None:
+                        yield request, generation
+                        continue
+                    task = asyncio.ensure_future(
+                        self._generate_one(request, generation_kwargs)
+                    )
+                    in_flight[task] = request
+                if not in_flight:
+                    if exhausted:
+                        return
+                    continue
+                done, _ = await asyncio.wait(
+                    in_flight, return_when=asyncio.FIRST_COMPLETED
+                )
+                for task in done:
+                    yield in_flight.pop(task), task.result()
+        finally:
+            for task in in_flight:
+                task.cancel()
+            await asyncio.gather(*in_flight, return_exceptions=True)
@@ -0,0 +1,173 @@
+import math
+import os
+import re
+import sqlite3
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, Iterator, List, Optional
+from .text import clean_text
+from .input_pool import read_new_inputs
+from .prompts import CARD_SYSTEM_PROMPT
+from .usage import model_prices
+
+
+TIME_PATTERN = re.compile(r"^\d{1,2}\s*[:h]\s*\d{2}\s*h?$", re.IGNORECASE)
+# Digits and the punctuation of fractions, decimals and ranges: "42", "1/4", "3,5".
+NUMBER_PATTERN = re.compile(r"^[\d\s.,/:+\-–%ºª°]+$")
+# Rough completion size of one five-option card, in tokens.
+COMPLETION_TOKENS_PER_CARD = 100
+
+
+@dataclass
+class WordFilters:
+    min_letters: int = 2
+    max_words: int = 8
+    max_length: int = 60
+    drop_numbers: bool = True
+    drop_times: bool = True
+    # Extra regular expressions; a word matching any of them is dropped.
+    patterns: List[str] = field(default_factory=list)
+
+
+def junk_reason(word: str, filters: WordFilters) -> Optional[str]:
+    text = word.strip()
+    if filters.drop_times and TIME_PATTERN.match(text):
+        return "time"
+    if filters.drop_numbers and NUMBER_PATTERN.match(text):
+        return "number"
+    key = clean_text(text) or ""
+    if sum(char.isalpha() for char in key) < filters.min_letters:
+        return "too_few_letters"
+    if len(text) > filters.max_length or len(text.split()) > filters.max_words:
+        return "too_long"
+    for pattern in filters.patterns:
+        if re.search(pattern, text):
+            return "pattern"
+    return None
+
+
+class GeneratedIndex:
+    """Normalized inputs of every dataset generated so far, kept in SQLite.
+
+    Keys use the ``clean_text`` rule of the filtering notebooks, the form
+    dataset inputs are stored in, so "Bíblia" matches a stored "biblia". CSV
+    datasets are read incrementally from the last committed offset, like
+    ``InputPool.sync``; columnar datasets only have their input column read.
+    """
+
+    def __init__(self, path: str = ":memory:"):
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS inputs (key TEXT PRIMARY KEY)")
+        self.conn.execute("CREATE TABLE IF NOT EXISTS offsets (path TEXT PRIMARY KEY, size INTEGER)")
+        self.conn.commit()
+
+    def __len__(self) -> int:
+        return self.conn.execute("SELECT COUNT(*) FROM inputs").fetchone()[0]
+
+    def __contains__(self, word: str) -> bool:
+        key = clean_text(word)
+        return bool(key) and self.conn.execute(
+            "SELECT 1 FROM inputs WHERE key = ?", (key,)
+        ).fetchone() is not None
+
+    def add(self, words: Iterable[str]) -> int:
+        before = self.conn.total_changes
+        self.conn.executemany(
+            "INSERT OR IGNORE INTO inputs (key) VALUES (?)",
+            ((key,) for key in map(clean_text, words) if key),
+        )
+        self.conn.commit()
+        return self.conn.total_changes - before
+
+    def sync(self, dataset_path: str) -> int:
+        if dataset_path.endswith((".parquet", ".arrow")):
+            # Imported here so CSV-only setups do not require pyarrow.
+            from .columnar import read_cards
+            if not os.path.exists(dataset_path):
+                return 0
+            return self.add(read_cards(dataset_path, columns=["input"]).column("input").to_pylist())
+        row = self.conn.execute(
+            "SELECT size FROM offsets WHERE path = ?", (dataset_path,)
+        ).fetchone()
+        inputs, size = read_new_inputs(dataset_path, row[0] if row else 0)
+        if size is None:
+            return 0
+        added = self.add(inputs)
+        self.conn.execute(
+            "INSERT OR REPLACE INTO offsets (path, size) VALUES (?, ?)", (dataset_path, size)
+        )
+        self.conn.commit()
+        return added
+
+    def close(self):
+        self.conn.commit()
+        self.conn.close()
+
+
+class WordPlanner:
+    """Filters a word stream down to the words worth a card request.
+
+    Junk words, repeats of an earlier word (by ``clean_text``) and words
+    already in ``index`` are dropped and counted. Seen keys live in a
+    private on-disk SQLite table, so memory stays flat however long the
+    stream is; the first spelling of each word is the one kept.
+    """
+
+    def __init__(self, filters: WordFilters, index: Optional[GeneratedIndex] = None):
+        self.filters = filters
+        self.index = index
+        self.total = 0
+        self.planned = 0
+        self.repeated = 0
+        self.already_generated = 0
+        self.junk: Dict[str, int] = {}
+        self._seen = sqlite3.connect("")
+        self._seen.execute("CREATE TABLE seen (key TEXT PRIMARY KEY)")
+
+    def filter(self, words: Iterable[str]) -> Iterator[str]:
+        for word in words:
+            self.total += 1
+            reason = junk_reason(word, self.filters)
+            if reason is not None:
+                self.junk[reason] = self.junk.get(reason, 0) + 1
+                continue
+            key = clean_text(word)
+            if not self._seen.execute("INSERT OR IGNORE INTO seen (key) VALUES (?)", (key,)).rowcount:
+                self.repeated += 1
+                continue
+            if self.index is not None and word in self.index:
+                self.already_generated += 1
+                continue
+            self.planned += 1
+            yield word.strip()
+
+    def summary(self) -> str:
+        junk = ", ".join(f"{reason}: {count}" for reason, count in sorted(self.junk.items())) or "none"
+        return (
+            f"Planned {self.planned} of {self.total} words "
+            f"(junk: {junk}; repeated: {self.repeated}; already generated: {self.already_generated})"
+        )
+
+    def close(self):
+        self._seen.close()
+
+
+def estimate_cost(
+    num_words: int,
+    model: str,
+    pack_size: int = 1,
+    system_prompt: str = CARD_SYSTEM_PROMPT,
+    completion_tokens_per_card: int = COMPLETION_TOKENS_PER_CARD,
+) -> Dict[str, float]:
+    # Same four-characters-per-token estimate as the rate limiter, without
+    # prompt caching or retries, so the cost is an upper bound of sorts.
+    calls = math.ceil(num_words / max(pack_size, 1))
+    prompt_tokens = calls * (len(system_prompt) // 4 + 20 * min(pack_size, max(num_words, 1)))
+    completion_tokens = num_words * completion_tokens_per_card
+    input_price, _, output_price = model_prices(model)
+    return {
+        "calls": calls,
+        "prompt_tokens": prompt_tokens,
+        "completion_tokens": completion_tokens,
+        "cost_usd": (prompt_tokens * input_price + completion_tokens * output_price) / 1_000_000,
+    }
@@ -0,0 +1,95 @@
+import sqlite3
+import time
+from typing import Dict, Iterable, Iterator
+from .text import normalize_word
+
+
+PENDING = "pending"
+IN_FLIGHT = "in_flight"
+DONE = "done"
+FAILED = "failed"
+
+
+class ProgressIndex:
+    """SQLite-backed record of which input words a run has already handled.
+
+    Words are keyed by ``normalize_word`` so a restart only sends what is
+    missing. A word is only marked done after its rows are committed to the
+    dataset; anything still ``in_flight`` when a run dies goes back to
+    pending on the next start.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.conn = sqlite3.connect(path)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute(
+            """CREATE TABLE IF NOT EXISTS words (
+                key TEXT PRIMARY KEY,
+                word TEXT NOT NULL,
+                status TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL NOT NULL
+            )"""
+        )
+        self.conn.execute("CREATE TEMP TABLE IF NOT EXISTS seen (key TEXT PRIMARY KEY)")
+        self.conn.commit()
+        self.skipped = 0
+
+    def reset_in_flight(self) -> int:
+        cursor = self.conn.execute(
+            "UPDATE words SET status = ? WHERE status = ?", (PENDING, IN_FLIGHT)
+        )
+        self.conn.commit()
+        return cursor.rowcount
+
+    def iter_pending(self, words: Iterable[str], retry_failed: bool = True) -> Iterator[str]:
+        # Words not yet done (or failed, unless retried), first spelling
+        # only. Repeats are tracked in a temporary table instead of memory,
+        # and ``skipped`` counts what was dropped.
+        skip = (DONE,) if retry_failed else (DONE, FAILED)
+        self.conn.execute("DELETE FROM temp.seen")
+        self.skipped = 0
+        for word in words:
+            key = normalize_word(word)
+            new = self.conn.execute(
+                "INSERT OR IGNORE INTO temp.seen (key) VALUES (?)", (key,)
+            ).rowcount
+            row = self.conn.execute("SELECT status FROM words WHERE key = ?", (key,)).fetchone()
+            if not new or (row is not None and row[0] in skip):
+                self.skipped += 1
+                continue
+            yield word
+
+    def _set_status(self, words: Iterable[str], status: str, error: str = None, attempt: bool = False):
+        now = time.time()
+        self.conn.executemany(
+            """INSERT INTO words (key, word, status, attempts, error, updated_at)
+               VALUES (?, ?, ?, ?, ?, ?)
+               ON CONFLICT(key) DO UPDATE SET
+                   status = excluded.status,
+                   attempts = words.attempts + excluded.attempts,
+                   error = excluded.error,
+                   updated_at = excluded.updated_at""",
+            [(normalize_word(word), word, status, int(attempt), error, now) for word in words],
+        )
+        self.conn.commit()
+
+    def mark_in_flight(self, words: Iterable[str]):
+        self._set_status(words, IN_FLIGHT, attempt=True)
+
+    def mark_done(self, words: Iterable[str]):
+        self._set_status(words, DONE)
+
+    def mark_failed(self, words: Iterable[str], error: str):
+        self._set_status(words, FAILED, error=error)
+
+    def counts(self) -> Dict[str, int]:
+        return dict(
+            self.conn.execute("SELECT status, COUNT(*) FROM words GROUP BY status")
+        )
+
+    def close(self):
+        self.conn.close()
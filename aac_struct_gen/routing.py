@@ -0,0 +1,229 @@
+import json
+import os
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional
+from urllib.parse import urlparse
+import httpx
+from distilabel.llms.base import AsyncLLM
+from pydantic import PrivateAttr
+from .engine import RETRYABLE_STATUS, ChatCompletionsLLM
+from .usage import UsageTotals, UsageTracker
+
+
+# Client errors caused by the endpoint's configuration, not the request.
+ENDPOINT_ERROR_STATUS = {401, 403, 404}
+
+
+@dataclass
+class EndpointHealth:
+    requests: int = 0
+    successes: int = 0
+    failures: int = 0
+    consecutive_failures: int = 0
+    ejections: int = 0
+    ejected_until: float = 0.0
+    latency_total: float = 0.0
+
+
+class RoutingLLM(AsyncLLM):
+    """Spreads requests over several chat-completions endpoints.
+
+    Each endpoint is a ``ChatCompletionsLLM`` with its own concurrency and
+    rpm/tpm limits. A request goes to the healthy endpoint with the fewest
+    outstanding requests per unit of ``weight``, so an endpoint that is
+    waiting on its rate limiter stops attracting work and the quotas add
+    up. ``failure_threshold`` consecutive failures eject an endpoint for
+    ``ejection_seconds``, doubling on each repeat up to ``max_ejection_seconds``;
+    after that it is tried again. A request that fails on one endpoint is
+    retried on the others (``max_attempts`` endpoints in total), so
+    in-flight batches fail over; client errors such as 400 are raised
+    straight away.
+    """
+
+    endpoints: List[ChatCompletionsLLM]
+    weights: Optional[List[float]] = None
+    failure_threshold: int = 3
+    ejection_seconds: float = 30.0
+    max_ejection_seconds: float = 300.0
+    max_attempts: Optional[int] = None
+
+    _health: List[EndpointHealth] = PrivateAttr(default_factory=list)
+    _failovers: int = PrivateAttr(0)
+
+    def load(self) -> None:
+        super().load()
+        if self.weights is not None and len(self.weights) != len(self.endpoints):
+            raise ValueError("weights must have one entry per endpoint")
+        if not self._routable():
+            raise ValueError("at least one endpoint needs a positive weight")
+        for endpoint in self.endpoints:
+            endpoint.load()
+        self._health = [EndpointHealth() for _ in self.endpoints]
+        self._failovers = 0
+
+    @property
+    def model_name(self) -> str:
+        # Deployments of one model share its cache keys and prices.
+        return "+".join(sorted({endpoint.model_name for endpoint in self.endpoints}))
+
+    @staticmethod
+    def endpoint_name(endpoint: ChatCompletionsLLM) -> str:
+        return f"{endpoint.model_name}@{urlparse(endpoint.base_url).netloc}"
+
+    def _weight(self, index: int) -> float:
+        return self.weights[index] if self.weights else 1.0
+
+    def _routable(self) -> List[int]:
+        # Weight 0 parks an endpoint: it gets no requests, not even failovers.
+        return [index for index in range(len(self.endpoints)) if self._weight(index) > 0]
+
+    def _pick(self, tried: List[int]) -> int:
+        now = time.monotonic()
+        candidates = [index for index in self._routable() if index not in tried]
+        healthy = [index for index in candidates if self._health[index].ejected_until <= now]
+        if not healthy:
+            # Everything left is ejected: use whichever comes back first.
+            return min(candidates, key=lambda index: self._health[index].ejected_until)
+
+        def load(index: int) -> float:
+            gauges = self.endpoints[index].gauges()
+            return (gauges["in_flight"] + gauges["queued"] + 1) / self._weight(index)
+
+        return min(healthy, key=load)
+
+    def _record_failure(self, index: int):
+        health = self._health[index]
+        health.failures += 1
+        health.consecutive_failures += 1
+        if health.ejected_until > time.monotonic():
+            # Requests sent before the ejection are still failing; they
+            # must not extend it.
+            return
+        if health.consecutive_failures >= self.failure_threshold:
+            health.ejections += 1
+            health.consecutive_failures = 0
+            seconds = min(
+                self.max_ejection_seconds,
+                self.ejection_seconds * 2 ** (health.ejections - 1),
+            )
+            health.ejected_until = time.monotonic() + seconds
+            print(f"Ejecting {self.endpoint_name(self.endpoints[index])} for {seconds:.0f}s")
+
+    @staticmethod
+    def _is_client_error(error: Exception) -> bool:
+        if not isinstance(error, httpx.HTTPStatusError):
+            return False
+        status = error.response.status_code
+        return status < 500 and status not in RETRYABLE_STATUS and status not in ENDPOINT_ERROR_STATUS
+
+    async def agenerate(  # type: ignore
+        self,
+        input: List[Dict[str, str]],
+        num_generations: int = 1,
+        max_new_tokens: int = 256,
+        temperature: Optional[float] = None,
+        top_p: Optional[float] = None,
+    ) -> List[Optional[str]]:
+        routable = len(self._routable())
+        attempts = min(self.max_attempts or routable, routable)
+        tried: List[int] = []
+        while True:
+            index = self._pick(tried)
+            tried.append(index)
+            health = self._health[index]
+            health.requests += 1
+            started = time.monotonic()
+            try:
+                output = await self.endpoints[index].agenerate(
+                    input=input,
+                    num_generations=num_generations,
+                    max_new_tokens=max_new_tokens,
+                    temperature=temperature,
+                    top_p=top_p,
+                )
+            except Exception as e:
+                if self._is_client_error(e):
+                    raise
+                self._record_failure(index)
+                if len(tried) >= attempts:
+                    raise
+                self._failovers += 1
+                continue
+            health.successes += 1
+            health.consecutive_failures = 0
+            health.ejections = 0
+            health.latency_total += time.monotonic() - started
+            return output
+
+    def endpoint_stats(self) -> List[Dict[str, Any]]:
+        now = time.monotonic()
+        stats = []
+        for index, (endpoint, health) in enumerate(zip(self.endpoints, self._health)):
+            gauges = endpoint.gauges()
+            stats.append({
+                "endpoint": self.endpoint_name(endpoint),
+                "weight": self._weight(index),
+                "requests": health.requests,
+                "successes": health.successes,
+                "failures": health.failures,
+                "throttled": gauges["throttled"],
+                "in_flight": gauges["in_flight"],
+                "ejected": health.ejected_until > now,
+                "ejections": health.ejections,
+                "mean_latency": health.latency_total / health.successes if health.successes else 0.0,
+            })
+        return stats
+
+    def gauges(self) -> Dict[str, float]:
+        totals: Dict[str, float] = {}
+        for endpoint in self.endpoints:
+            for name, value in endpoint.gauges().items():
+                totals[name] = totals.get(name, 0) + value
+        totals["failovers"] = self._failovers
+        for index, stats in enumerate(self.endpoint_stats()):
+            for name in ("requests", "failures", "throttled", "in_flight", "ejected"):
+                totals[f"endpoint_{index}_{name}"] = int(stats[name])
+        return totals
+
+    @property
+    def usage(self) -> UsageTracker:
+        # Endpoints record their own usage; this is the merged view.
+        merged = UsageTracker()
+        for endpoint in self.endpoints:
+            for model, totals in endpoint.usage.totals.items():
+                combined = merged.totals.setdefault(model, UsageTotals())
+                combined.requests += totals.requests
+                combined.prompt_tokens += totals.prompt_tokens
+                combined.cached_tokens += totals.cached_tokens
+                combined.completion_tokens += totals.completion_tokens
+        return merged
+
+
+def load_endpoints(path: str, usage_log: Optional[str] = None) -> RoutingLLM:
+    """Builds a ``RoutingLLM`` from a JSON file such as::
+
+        {"endpoints": [
+            {"model": "gpt-4o-mini", "rpm": 5000, "tpm": 2000000, "weight": 2},
+            {"model": "gpt-4o-mini", "base_url": "https://x.openai.azure.com",
+             "api_version": "2024-06-01", "api_key_env": "AZURE_OPENAI_API_KEY"}
+        ]}
+
+    ``api_key_env`` names the environment variable holding the key
+    (OPENAI_API_KEY by default). Endpoints retry only once themselves
+    unless ``max_retries`` is set, leaving failures to the router.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        config = json.load(f)
+    endpoints, weights = [], []
+    for entry in config["endpoints"]:
+        entry = dict(entry)
+        weights.append(float(entry.pop("weight", 1.0)))
+        api_key = os.environ.get(entry.pop("api_key_env", "OPENAI_API_KEY"))
+        entry.setdefault("max_retries", 1)
+        endpoints.append(ChatCompletionsLLM(api_key=api_key, usage_log=usage_log, **entry))
+    return RoutingLLM(
+        endpoints=endpoints,
+        weights=weights,
+        **{key: value for key, value in config.items() if key != "endpoints"},
+    )
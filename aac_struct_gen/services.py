@@ -1,5 +1,8 @@
-from typing import List
-import pandas as pd
+import itertools
+import json
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from pydantic import ValidationError
+from .cache import ResponseCache
 from .models import (
     CardRequest,
     SynonymRequest,
@@ -7,93 +10,461 @@ from .models import (
     CardResponse,
     DatasetRow,
 )
-from .pipelines import SynonymPipeline, CardPipeline
+from .near_duplicates import NearDuplicateFilterSink, NearDuplicateIndex
+from .pipelines import SynonymPipeline, CardPipeline, GenerationStream
+from .parsing import parse_card, parse_options
+from .prompts import CARD_RETRY_HINT, build_packed_card_instruction
+from .sinks import DatasetSink, SinkConfig, open_sink
+from .telemetry import TelemetryHook, TimedSink, timed
+from .text import normalize_word
 
 
 class AACService:
-    def __init__(self, llm):
+    def __init__(
+        self,
+        llm,
+        sink_config: SinkConfig = None,
+        cache: Optional[ResponseCache] = None,
+        streaming: bool = False,
+        max_in_flight: int = 8,
+        near_duplicates: Optional[NearDuplicateIndex] = None,
+        pack_size: int = 1,
+        card_retries: int = 2,
+        retry_queue_size: int = 1000,
+        hooks: Optional[List[TelemetryHook]] = None,
+    ):
         self.llm = llm
         self.synonym_pipeline = SynonymPipeline(llm)
         self.card_pipeline = CardPipeline(llm)
+        self.stream = GenerationStream(llm, max_in_flight)
+        self.streaming = streaming
+        self.sink_config = sink_config or SinkConfig()
+        self.cache = cache
+        self.near_duplicates = near_duplicates
+        # Words per card request; above 1 cards are requested as a JSON array.
+        # Adaptive limits may lower pack_size at runtime, never above
+        # max_pack_size, which sizes the completion budget.
+        self.pack_size = pack_size
+        self.max_pack_size = pack_size
+        # Malformed cards are regenerated up to ``card_retries`` times, for
+        # at most ``retry_queue_size`` words per pass.
+        self.card_retries = card_retries
+        self.retry_queue_size = retry_queue_size
+        self._sinks: Dict[str, DatasetSink] = {}
+        self.hooks: List[TelemetryHook] = []
+        for hook in hooks or []:
+            self.add_hook(hook)
+        self.stream.on_request = self._on_request
+
+    def add_hook(self, hook: TelemetryHook):
+        hook.bind(self)
+        self.hooks.append(hook)
+
+    def stage(self, name: str):
+        return timed(self.hooks, name)
+
+    def count(self, name: str, value: int = 1):
+        for hook in self.hooks:
+            hook.on_count(name, value)
+
+    def _on_request(self, seconds: float, ok: bool):
+        for hook in self.hooks:
+            hook.on_request(seconds, ok)
+
+    def runtime_gauges(self) -> Dict[str, float]:
+        gauges = {}
+        if hasattr(self.llm, "gauges"):
+            gauges.update(self.llm.gauges())
+        report = self.usage_report()
+        if report:
+            total = report["total"]
+            for name in ("prompt_tokens", "cached_tokens", "completion_tokens"):
+                gauges[name] = total[name]
+            gauges["total_tokens"] = total["prompt_tokens"] + total["completion_tokens"]
+        if self.cache:
+            stats = self.cache.stats()
+            gauges["cache_hits"] = stats["hits"]
+            gauges["cache_misses"] = stats["misses"]
+        return gauges
+
+    @property
+    def model_name(self) -> str:
+        return getattr(self.llm, "model_name", type(self.llm).__name__)
+
+    def _cache_key(
+        self, request: Union[SynonymRequest, CardRequest], generation_kwargs: Dict[str, Any]
+    ) -> str:
+        attempt = getattr(request, "attempt", 0)
+        return ResponseCache.make_key(
+            self.model_name,
+            request.system_prompt,
+            request.instruction,
+            {**generation_kwargs, "attempt": attempt} if attempt else generation_kwargs,
+        )
+
+    def _run_pipeline(
+        self,
+        pipeline_factory: Union[SynonymPipeline, CardPipeline],
+        step_name: str,
+        requests: List[Union[SynonymRequest, CardRequest]],
+        generation_kwargs: Dict[str, Any],
+    ) -> Dict[str, Optional[str]]:
+        with self.stage("pipeline_build"):
+            pipeline = pipeline_factory.create_pipeline(requests)
+        with self.stage("llm_wait"):
+            distiset = pipeline.run(
+                parameters={step_name: {"llm": {"generation_kwargs": generation_kwargs}}},
+                use_cache=False,
+            )
+        return {
+            result["instruction"]: result.get("generation")
+            for result in distiset["default"]["train"]
+        }
+
+    def _generate(
+        self,
+        pipeline_factory: Union[SynonymPipeline, CardPipeline],
+        step_name: str,
+        requests: List[Union[SynonymRequest, CardRequest]],
+        generation_kwargs: Dict[str, Any],
+        parse: Optional[Callable[[Any, str], Any]] = None,
+    ) -> List[Dict[str, Any]]:
+        # With ``parse``, results carry the parsed value under "parsed".
+        # Raw generations are cached whether they parse or not, so a re-run
+        # after a parser change sends nothing.
+        keys = [self._cache_key(request, generation_kwargs) for request in requests]
+        generations = self.cache.get_many(keys) if self.cache else {}
+
+        misses = [
+            request for request, key in zip(requests, keys) if key not in generations
+        ]
+        new_keys = set()
+        # A read-only cache never triggers generation: misses are dropped.
+        if misses and not (self.cache and self.cache.read_only):
+            if self.streaming:
+                with self.stage("llm_wait"):
+                    by_instruction = {
+                        request.instruction: generation
+                        for request, generation in self.stream.run(misses, generation_kwargs)
+                    }
+            else:
+                by_instruction = self._run_pipeline(
+                    pipeline_factory, step_name, misses, generation_kwargs
+                )
+            for request, key in zip(requests, keys):
+                generation = by_instruction.get(request.instruction)
+                if key not in generations and generation is not None:
+                    generations[key] = generation
+                    new_keys.add(key)
+
+        results = []
+        new_entries = []
+        for request, key in zip(requests, keys):
+            if key not in generations:
+                continue
+            result = {"instruction": request.instruction, "generation": generations[key]}
+            if parse is not None:
+                with self.stage("parse"):
+                    result["parsed"] = parse(request, generations[key])
+            if key in new_keys:
+                new_entries.append((key, generations[key]))
+            results.append(result)
+        if self.cache and new_entries:
+            self.cache.put_many(new_entries)
+        return results
+
+    def stream_generations(
+        self,
+        requests: Iterable[Union[SynonymRequest, CardRequest]],
+        generation_kwargs: Dict[str, Any],
+        parse: Optional[Callable[[Any, str], Any]] = None,
+    ) -> Iterator[Tuple[Union[SynonymRequest, CardRequest], Any]]:
+        # With ``parse``, the parsed value (None if invalid) is yielded in
+        # place of the generation; the raw generation is always cached.
+        def parsed(request, generation):
+            if parse is None or generation is None:
+                return generation
+            with self.stage("parse"):
+                return parse(request, generation)
+
+        if self.cache is None:
+            for request, generation in self._timed_stream(requests, generation_kwargs):
+                yield request, parsed(request, generation)
+            return
+        if self.cache.read_only:
+            for request in requests:
+                if request is None:
+                    continue
+                generation = self.cache.get(self._cache_key(request, generation_kwargs))
+                yield request, parsed(request, generation)
+            return
+
+        cached_keys = set()
+
+        def lookup(request):
+            key = self._cache_key(request, generation_kwargs)
+            generation = self.cache.get(key)
+            if generation is not None:
+                cached_keys.add(key)
+            return generation
+
+        for request, generation in self._timed_stream(requests, generation_kwargs, lookup):
+            key = self._cache_key(request, generation_kwargs)
+            result = parsed(request, generation)
+            if key in cached_keys:
+                cached_keys.discard(key)
+            elif generation is not None:
+                self.cache.put(key, generation)
+            yield request, result
+
+    def _timed_stream(self, requests, generation_kwargs, lookup=None):
+        # Time spent blocked on the stream is time spent waiting for the LLM.
+        results = self.stream.run(requests, generation_kwargs, lookup)
+        while True:
+            with self.stage("llm_wait"):
+                item = next(results, None)
+            if item is None:
+                return
+            yield item
 
     def generate_synonyms(
         self, inputs: List[str], system_prompt: str
     ) -> List[SynonymResponse]:
-        requests = [
-            SynonymRequest(
-                system_prompt=system_prompt,
-                instruction=f"Generate synonyms for the word: {word}",
-            )
-            for word in inputs
-        ]
-        pipeline = self.synonym_pipeline.create_pipeline(requests)
-        distiset = pipeline.run(
-            parameters={
-                "synonym_generation": {
-                    "llm": {"generation_kwargs": {"max_new_tokens": 256}}
-                }
-            },
-            use_cache=False,
+        requests = [self.synonym_request(word, system_prompt) for word in inputs]
+        results = self._generate(
+            self.synonym_pipeline,
+            "synonym_generation",
+            requests,
+            {"max_new_tokens": 256},
+            self.parse_synonyms,
         )
-        results = distiset["default"]["train"]
-
-        synonym_responses = []
-        for result in results:
-            if "generation" in result:
-                generated_text = result["generation"]
-                synonyms = [synonym.strip() for synonym in generated_text.split(",")]
-                synonym_responses.append(
-                    SynonymResponse(
-                        input=result["instruction"].split(": ")[1], synonyms=synonyms
-                    )
-                )
+        return [result["parsed"] for result in results]
 
-        return synonym_responses
+    @staticmethod
+    def synonym_request(word: str, system_prompt: str) -> SynonymRequest:
+        return SynonymRequest(
+            system_prompt=system_prompt,
+            instruction=f"Generate synonyms for the word: {word}",
+            input=word,
+        )
+
+    @staticmethod
+    def parse_synonyms(request: SynonymRequest, generated_text: str) -> SynonymResponse:
+        synonyms = [synonym.strip() for synonym in generated_text.split(",")]
+        return SynonymResponse(input=request.input, synonyms=[synonym for synonym in synonyms if synonym])
+
+    @staticmethod
+    def card_request(word: str, system_prompt: str, attempt: int = 0) -> CardRequest:
+        instruction = f"Create a speech card following EXACTLY this format:\ninput: {word}\noutput: [5 options]"
+        if attempt:
+            instruction = f"{instruction}\n{CARD_RETRY_HINT}"
+        return CardRequest(system_prompt=system_prompt, instruction=instruction, input=word, attempt=attempt)
+
+    @staticmethod
+    def parse_card(request: CardRequest, generated_text: str) -> Optional[CardResponse]:
+        return parse_card(request.input, generated_text)
+
+    @staticmethod
+    def packed_card_request(words: List[str], system_prompt: str) -> CardRequest:
+        return CardRequest(
+            system_prompt=system_prompt,
+            instruction=build_packed_card_instruction(words),
+            input="\n".join(words),
+        )
+
+    @staticmethod
+    def parse_packed_cards(request: CardRequest, generated_text: str) -> Optional[Dict[str, CardResponse]]:
+        # Objects are matched to the requested words by normalized input;
+        # anything malformed or unrequested is left out and retried alone.
+        start, end = generated_text.find("["), generated_text.rfind("]")
+        if start < 0 or end < start:
+            return None
+        try:
+            items = json.loads(generated_text[start:end + 1])
+        except json.JSONDecodeError:
+            return None
+        if not isinstance(items, list):
+            return None
+        requested = {normalize_word(word): word for word in request.input.split("\n")}
+        cards = {}
+        for item in items:
+            try:
+                card = CardResponse.model_validate(item)
+            except ValidationError:
+                continue
+            word = requested.get(normalize_word(card.input))
+            options = parse_options(card.output)
+            if word is not None and word not in cards and options is not None:
+                cards[word] = CardResponse(input=word, output=options)
+        return cards or None
+
+    def _packs(self, inputs: Iterable[str]) -> Iterator[List[str]]:
+        iterator = iter(inputs)
+        while True:
+            pack = list(itertools.islice(iterator, self.pack_size))
+            if not pack:
+                return
+            yield pack
+
+    def _packed_kwargs(self) -> Dict[str, Any]:
+        return {"max_new_tokens": 256 * self.max_pack_size}
+
+    def _retry_queue(self, failed: List[str]) -> Tuple[List[str], List[str]]:
+        # Only the first ``retry_queue_size`` failures are regenerated; the
+        # rest are given up on straight away.
+        return failed[:self.retry_queue_size], failed[self.retry_queue_size:]
 
     def generate_cards(
         self, inputs: List[str], system_prompt: str
     ) -> List[CardResponse]:
+        cards: Dict[str, CardResponse] = {}
+        if self.pack_size > 1:
+            cards.update(self._generate_packed_cards(inputs, system_prompt))
+            failed = [word for word in inputs if word not in cards]
+            self.count("parse_failures", len(failed))
+            pending, _ = self._retry_queue(failed)
+            self.count("card_retries", len(pending))
+            attempt = 1
+        else:
+            pending, attempt = list(inputs), 0
+        while pending and attempt <= self.card_retries:
+            cards.update(self._generate_single_cards(pending, system_prompt, attempt))
+            failed = [word for word in pending if word not in cards]
+            self.count("parse_failures", len(failed))
+            pending, _ = self._retry_queue(failed)
+            if attempt < self.card_retries:
+                self.count("card_retries", len(pending))
+            attempt += 1
+        self.count("cards", len(cards))
+        return [cards[word] for word in inputs if word in cards]
+
+    def _generate_single_cards(
+        self, inputs: List[str], system_prompt: str, attempt: int
+    ) -> Dict[str, CardResponse]:
+        requests = [self.card_request(word, system_prompt, attempt) for word in inputs]
+        results = self._generate(
+            self.card_pipeline,
+            "card_generation",
+            requests,
+            {"max_new_tokens": 256},
+            self.parse_card,
+        )
+        return {
+            result["parsed"].input: result["parsed"]
+            for result in results
+            if result["parsed"] is not None
+        }
+
+    def _generate_packed_cards(
+        self, inputs: List[str], system_prompt: str
+    ) -> Dict[str, CardResponse]:
         requests = [
-            CardRequest(
-                system_prompt=system_prompt,
-                instruction=f"Create a speech card following EXACTLY this format:\ninput: {word}\noutput: [5 options]",
-            )
-            for word in inputs
+            self.packed_card_request(pack, system_prompt) for pack in self._packs(inputs)
         ]
-        pipeline = self.card_pipeline.create_pipeline(requests)
-        distiset = pipeline.run(
-            parameters={
-                "card_generation": {
-                    "llm": {"generation_kwargs": {"max_new_tokens": 256}}
-                }
-            },
-            use_cache=False,
-        )
-        results = distiset["default"]["train"]
-
-        card_responses = []
-        for result in results:
-            if "generation" in result:
-                generated_text = result["generation"]
-                parts = generated_text.split("output:")
-                if len(parts) == 2:
-                    input_part = parts[0].replace("input:", "").strip()
-                    output_part = parts[1].strip()
-                    card_responses.append(
-                        CardResponse(input=input_part, output=output_part.split("\n"))
-                    )
+        cards: Dict[str, CardResponse] = {}
+        for result in self._generate(
+            self.card_pipeline,
+            "card_generation",
+            requests,
+            self._packed_kwargs(),
+            self.parse_packed_cards,
+        ):
+            cards.update(result["parsed"] or {})
+        return cards
+
+    def stream_cards(
+        self, inputs: Iterable[str], system_prompt: str
+    ) -> Iterator[Tuple[str, Optional[CardResponse]]]:
+        if self.pack_size > 1:
+            results = self._stream_packed_cards(inputs, system_prompt)
+        else:
+            requests = (self.card_request(word, system_prompt) for word in inputs)
+            results = self._stream_single_cards(requests)
+
+        # Failed words wait in the retry queue until the current pass is
+        # done and are then regenerated, alone and with a format reminder.
+        for attempt in range(1, self.card_retries + 2):
+            failed = []
+            for word, card in results:
+                if card is None:
+                    self.count("parse_failures")
+                if card is None and attempt <= self.card_retries:
+                    failed.append(word)
                 else:
-                    card_responses.append(
-                        CardResponse(
-                            input=result["instruction"].split(": ")[1],
-                            output=generated_text.split("\n"),
-                        )
-                    )
+                    if card is not None:
+                        self.count("cards")
+                    yield word, card
+            retries, dropped = self._retry_queue(failed)
+            for word in dropped:
+                yield word, None
+            if not retries:
+                return
+            self.count("card_retries", len(retries))
+            requests = (self.card_request(word, system_prompt, attempt) for word in retries)
+            results = self._stream_single_cards(requests)
 
-        return card_responses
+    def _stream_single_cards(
+        self, requests: Iterable[CardRequest]
+    ) -> Iterator[Tuple[str, Optional[CardResponse]]]:
+        for request, card in self.stream_generations(
+            requests, {"max_new_tokens": 256}, self.parse_card
+        ):
+            yield request.input, card
+
+    def _stream_packed_cards(
+        self, inputs: Iterable[str], system_prompt: str
+    ) -> Iterator[Tuple[str, Optional[CardResponse]]]:
+        requests = (self.packed_card_request(pack, system_prompt) for pack in self._packs(inputs))
+        for request, cards in self.stream_generations(
+            requests, self._packed_kwargs(), self.parse_packed_cards
+        ):
+            cards = cards or {}
+            for word in request.input.split("\n"):
+                yield word, cards.get(word)
+
+    def get_sink(self, dataset_path: str) -> DatasetSink:
+        sink = self._sinks.get(dataset_path)
+        if sink is None:
+            sink = TimedSink(open_sink(dataset_path, self.sink_config), self)
+            if self.near_duplicates is not None:
+                sink = NearDuplicateFilterSink(sink, self.near_duplicates)
+            self._sinks[dataset_path] = sink
+        return sink
 
     def update_dataset(self, dataset_path: str, new_data: List[DatasetRow]):
-        dataset = pd.read_csv(dataset_path)
-        new_dataset = pd.DataFrame([row.model_dump() for row in new_data])
-        combined_dataset = pd.concat([dataset, new_dataset], ignore_index=True)
-        combined_dataset.to_csv(dataset_path, index=False)
+        self.get_sink(dataset_path).write(new_data)
+
+    def flush(self):
+        for sink in self._sinks.values():
+            sink.flush()
+
+    def usage_report(self) -> Optional[Dict[str, Dict[str, Any]]]:
+        # Only LLMs running in this process (the async and fake backends)
+        # expose usage; distilabel pipeline steps run in subprocesses.
+        usage = getattr(self.llm, "usage", None)
+        return usage.report() if usage is not None else None
+
+    def close(self):
+        for sink in self._sinks.values():
+            sink.close()
+        self._sinks.clear()
+        report = self.usage_report()
+        if report and report["total"]["requests"]:
+            total = report["total"]
+            print(
+                f"Token usage: {total['requests']} requests, "
+                f"{total['prompt_tokens']} prompt ({total['cached_tokens']} cached, "
+                f"{total['cache_hit_rate']:.1%} hit rate), "
+                f"{total['completion_tokens']} completion, "
+                f"${total['cost_usd']:.4f} (saved ${total['cache_savings_usd']:.4f})"
+            )
+        for hook in self.hooks:
+            hook.close()
+        self.hooks = []
+        if self.cache:
+            print(f"Response cache: {self.cache.stats()}")
+            self.cache.close()
+            self.cache = None
+        if self.near_duplicates is not None:
+            self.near_duplicates.close()
+            self.near_duplicates = None
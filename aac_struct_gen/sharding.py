@@ -0,0 +1,79 @@
+import hashlib
+import io
+import os
+import shutil
+from pathlib import Path
+from typing import List, Tuple
+import pandas as pd
+from .models import DatasetRow
+from .sinks import DATASET_COLUMNS, SinkConfig, open_sink, read_committed_size
+from .text import normalize_word
+
+
+def shard_of(word: str, num_shards: int) -> int:
+    # sha1 rather than hash(): the assignment must not depend on the
+    # process, the Python version or PYTHONHASHSEED.
+    digest = hashlib.sha1(normalize_word(word).encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "big") % num_shards
+
+
+def shard_path(path: str, shard_index: int, num_shards: int) -> str:
+    # dataset.csv -> dataset.shard-03-of-08.csv
+    path = Path(path)
+    return str(path.with_name(f"{path.stem}.shard-{shard_index:02d}-of-{num_shards:02d}{path.suffix}"))
+
+
+def read_committed_rows(path: str) -> pd.DataFrame:
+    # Only the committed prefix is read, so a shard that is still being
+    # written (or crashed mid-write) never contributes a partial row.
+    if path.endswith((".parquet", ".arrow")):
+        # Imported here so CSV-only setups do not require pyarrow.
+        from .columnar import read_cards, table_to_frame
+        return table_to_frame(read_cards(path))
+    size = read_committed_size(path)
+    with open(path, "rb") as f:
+        data = f.read() if size is None else f.read(size)
+    if not data.strip():
+        return pd.DataFrame(columns=DATASET_COLUMNS)
+    return pd.read_csv(io.BytesIO(data), dtype=str, keep_default_na=False)
+
+
+def _remove_dataset(path: str):
+    if os.path.isdir(path):
+        shutil.rmtree(path)
+    elif os.path.exists(path):
+        os.remove(path)
+    if os.path.exists(f"{path}.commit"):
+        os.remove(f"{path}.commit")
+
+
+def merge_shards(paths: List[str], output_path: str) -> Tuple[int, int]:
+    # An existing output (an earlier merge, or a dataset generated without
+    # shards) is merged in as well, so none of its rows are lost.
+    frames = [read_committed_rows(path) for path in paths + [output_path] if os.path.exists(path)]
+    if frames:
+        merged = pd.concat(frames, ignore_index=True)[DATASET_COLUMNS]
+    else:
+        merged = pd.DataFrame(columns=DATASET_COLUMNS)
+    total = len(merged)
+    # Sorting on every column makes the result independent of shard count
+    # and completion order; the first row per normalized input is kept.
+    merged["_key"] = merged["input"].map(normalize_word)
+    merged = merged.sort_values(["_key", "input", "output"], kind="mergesort")
+    merged = merged.drop_duplicates("_key")
+
+    # Written next to the output and moved over it once complete, so an
+    # interrupted merge leaves the previous output in place.
+    output = Path(output_path)
+    tmp_path = str(output.with_name(f"{output.stem}.merging{output.suffix}"))
+    _remove_dataset(tmp_path)
+    with open_sink(tmp_path, SinkConfig(buffer_batches=1)) as sink:
+        sink.write([
+            DatasetRow(input=input_text, output=output_text)
+            for input_text, output_text in zip(merged["input"], merged["output"])
+        ])
+    _remove_dataset(output_path)
+    os.replace(tmp_path, output_path)
+    if os.path.exists(f"{tmp_path}.commit"):
+        os.replace(f"{tmp_path}.commit", f"{output_path}.commit")
+    return total, len(merged)
@@ -0,0 +1,149 @@
+import csv
+import io
+import json
+import os
+from dataclasses import dataclass
+from typing import List
+from .models import DatasetRow
+
+
+DATASET_COLUMNS = list(DatasetRow.model_fields)
+
+
+@dataclass
+class SinkConfig:
+    # Number of batches kept in memory before they are committed to disk.
+    buffer_batches: int = 1
+    # fsync the data file and the commit marker on every commit.
+    fsync: bool = True
+
+
+class DatasetSink:
+    @property
+    def pending_batches(self) -> int:
+        return 0
+
+    def write(self, rows: List[DatasetRow]):
+        raise NotImplementedError
+
+    def flush(self):
+        raise NotImplementedError
+
+    def close(self):
+        self.flush()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class CsvDatasetSink(DatasetSink):
+    """Append-only CSV writer.
+
+    Every commit appends the pending batches with a single write and then
+    atomically replaces ``<path>.commit`` with the new committed size. Bytes
+    past the committed size (a write interrupted by a crash) are truncated
+    the next time the file is opened, so readers never see a partial row.
+    """
+
+    def __init__(self, path: str, config: SinkConfig = None):
+        self.path = path
+        self.marker_path = f"{path}.commit"
+        self.config = config or SinkConfig()
+        self._pending: List[bytes] = []
+        self._file = None
+        self._committed_size = self._recover()
+
+    @property
+    def pending_batches(self) -> int:
+        return len(self._pending)
+
+    def _recover(self) -> int:
+        if not os.path.exists(self.path) or os.path.getsize(self.path) == 0:
+            header = self._encode([DATASET_COLUMNS])
+            with open(self.path, "wb") as f:
+                f.write(header)
+                f.flush()
+                if self.config.fsync:
+                    os.fsync(f.fileno())
+            self._write_marker(len(header))
+            return len(header)
+
+        size = os.path.getsize(self.path)
+        committed = read_committed_size(self.path)
+        if committed is None or committed > size:
+            # Files written before the sink existed have no marker; they
+            # were always rewritten whole, so their current size is final.
+            self._write_marker(size)
+            return size
+        if committed < size:
+            with open(self.path, "r+b") as f:
+                f.truncate(committed)
+        return committed
+
+    @staticmethod
+    def _encode(records) -> bytes:
+        buffer = io.StringIO()
+        writer = csv.writer(buffer, lineterminator="\n")
+        writer.writerows(records)
+        return buffer.getvalue().encode("utf-8")
+
+    def _write_marker(self, size: int):
+        tmp_path = f"{self.marker_path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump({"size": size}, f)
+            f.flush()
+            if self.config.fsync:
+                os.fsync(f.fileno())
+        os.replace(tmp_path, self.marker_path)
+
+    def write(self, rows: List[DatasetRow]):
+        if not rows:
+            return
+        self._pending.append(
+            self._encode([[getattr(row, column) for column in DATASET_COLUMNS] for row in rows])
+        )
+        if len(self._pending) >= self.config.buffer_batches:
+            self.flush()
+
+    def flush(self):
+        if not self._pending:
+            return
+        data = b"".join(self._pending)
+        if self._file is None:
+            self._file = open(self.path, "ab")
+        self._file.write(data)
+        self._file.flush()
+        if self.config.fsync:
+            os.fsync(self._file.fileno())
+        self._committed_size += len(data)
+        self._write_marker(self._committed_size)
+        self._pending = []
+
+    def close(self):
+        self.flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+def read_committed_size(path: str):
+    try:
+        with open(f"{path}.commit", "r", encoding="utf-8") as f:
+            return int(json.load(f)["size"])
+    except (OSError, ValueError, KeyError):
+        return None
+
+
+def open_sink(path: str, config: SinkConfig = None) -> DatasetSink:
+    if path.endswith(".parquet"):
+        # Imported here so the CSV path does not require pyarrow.
+        from .columnar import ParquetDatasetSink
+        return ParquetDatasetSink(path, config)
+    if path.endswith(".arrow"):
+        # An Arrow IPC file cannot be appended to; columnar.write_arrow
+        # writes one in a single pass.
+        raise ValueError(f"Cannot append to {path}: use a .parquet or .csv output")
+    return CsvDatasetSink(path, config)
@@ -0,0 +1,267 @@
+import bisect
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional
+from .models import DatasetRow
+from .sinks import DatasetSink
+
+
+LATENCY_BUCKETS = [0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0]
+
+
+class TelemetryHook:
+    """Receives runtime events from ``AACService``; every method is optional.
+
+    Stages are "pipeline_build", "llm_wait", "parse" and "write". Counts
+    include "cards", "parse_failures", "card_retries" and "rows_written".
+    """
+
+    def bind(self, service):
+        pass
+
+    def on_stage(self, stage: str, seconds: float):
+        pass
+
+    def on_request(self, seconds: float, ok: bool):
+        pass
+
+    def on_count(self, name: str, value: int = 1):
+        pass
+
+    def close(self):
+        pass
+
+
+class Histogram:
+    def __init__(self, buckets: List[float] = LATENCY_BUCKETS):
+        self.buckets = list(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def quantile(self, q: float) -> float:
+        # Upper bound of the bucket holding the q-th observation.
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets + [float("inf")], self.counts):
+            seen += count
+            if seen >= rank:
+                return bound
+        return float("inf")
+
+    def cumulative(self) -> List[int]:
+        total, result = 0, []
+        for count in self.counts:
+            total += count
+            result.append(total)
+        return result
+
+
+class MetricsExporter(TelemetryHook):
+    """Aggregates telemetry and periodically writes it to disk.
+
+    ``json_path`` gets a JSON snapshot and ``prometheus_path`` the same
+    metrics in Prometheus text format (for the node_exporter textfile
+    collector). Both are rewritten atomically every ``interval`` seconds
+    from a background thread and once more on ``close``. Service gauges
+    read SQLite, so they are collected on the thread reporting events, at
+    most once per ``interval``, and the background thread only exports.
+    """
+
+    def __init__(
+        self,
+        json_path: Optional[str] = None,
+        prometheus_path: Optional[str] = None,
+        interval: float = 30.0,
+    ):
+        self.json_path = json_path
+        self.prometheus_path = prometheus_path
+        self.interval = interval
+        self.started_at = time.time()
+        self.stages: Dict[str, Histogram] = {}
+        self.latency = Histogram()
+        self.counters: Dict[str, int] = {"requests_ok": 0, "requests_failed": 0}
+        self.service = None
+        self.gauges: Dict[str, float] = {}
+        self._gauges_at = 0.0
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def bind(self, service):
+        self.service = service
+
+    def on_stage(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages.setdefault(stage, Histogram()).observe(seconds)
+        self.refresh_gauges()
+
+    def on_request(self, seconds: float, ok: bool):
+        with self._lock:
+            self.latency.observe(seconds)
+            self.counters["requests_ok" if ok else "requests_failed"] += 1
+        self.refresh_gauges()
+
+    def on_count(self, name: str, value: int = 1):
+        with self._lock:
+            self.counters[name] = self.counters.get(name, 0) + value
+        self.refresh_gauges()
+
+    def refresh_gauges(self, force: bool = False):
+        # Must run on the service's thread: the response cache connection
+        # cannot be used from the export thread.
+        now = time.monotonic()
+        if self.service is None or (not force and now - self._gauges_at < self.interval):
+            return
+        gauges = self.service.runtime_gauges()
+        with self._lock:
+            self.gauges = gauges
+            self._gauges_at = now
+
+    def snapshot(self) -> Dict[str, Any]:
+        elapsed = max(time.time() - self.started_at, 1e-9)
+        with self._lock:
+            gauges = dict(self.gauges)
+            stages = {
+                name: {
+                    "calls": histogram.count,
+                    "seconds": histogram.sum,
+                    "share": 0.0,
+                    "p50": histogram.quantile(0.5),
+                    "p95": histogram.quantile(0.95),
+                }
+                for name, histogram in self.stages.items()
+            }
+            counters = dict(self.counters)
+            latency = {
+                "count": self.latency.count,
+                "sum": self.latency.sum,
+                "p50": self.latency.quantile(0.5),
+                "p95": self.latency.quantile(0.95),
+                "p99": self.latency.quantile(0.99),
+                "buckets": dict(zip(
+                    [str(bound) for bound in self.latency.buckets] + ["+Inf"],
+                    self.latency.cumulative(),
+                )),
+            }
+        busy = sum(stage["seconds"] for stage in stages.values())
+        for stage in stages.values():
+            stage["share"] = stage["seconds"] / busy if busy else 0.0
+        return {
+            "timestamp": time.time(),
+            "uptime_seconds": elapsed,
+            "stages": stages,
+            "request_latency": latency,
+            "counters": counters,
+            "gauges": gauges,
+            "rates": {
+                "words_per_minute": counters.get("cards", 0) / elapsed * 60,
+                "requests_per_second": latency["count"] / elapsed,
+                "tokens_per_second": gauges.get("total_tokens", 0) / elapsed,
+            },
+        }
+
+    @staticmethod
+    def to_prometheus(snapshot: Dict[str, Any]) -> str:
+        lines = [
+            "# TYPE aac_stage_seconds_total counter",
+            *(
+                f'aac_stage_seconds_total{{stage="{name}"}} {stage["seconds"]}'
+                for name, stage in snapshot["stages"].items()
+            ),
+            "# TYPE aac_stage_calls_total counter",
+            *(
+                f'aac_stage_calls_total{{stage="{name}"}} {stage["calls"]}'
+                for name, stage in snapshot["stages"].items()
+            ),
+            "# TYPE aac_request_latency_seconds histogram",
+            *(
+                f'aac_request_latency_seconds_bucket{{le="{bound}"}} {count}'
+                for bound, count in snapshot["request_latency"]["buckets"].items()
+            ),
+            f'aac_request_latency_seconds_sum {snapshot["request_latency"]["sum"]}',
+            f'aac_request_latency_seconds_count {snapshot["request_latency"]["count"]}',
+        ]
+        for name, value in snapshot["counters"].items():
+            lines += [f"# TYPE aac_{name}_total counter", f"aac_{name}_total {value}"]
+        for name, value in {**snapshot["gauges"], **snapshot["rates"]}.items():
+            lines += [f"# TYPE aac_{name} gauge", f"aac_{name} {value}"]
+        lines += ["# TYPE aac_uptime_seconds gauge", f'aac_uptime_seconds {snapshot["uptime_seconds"]}']
+        return "\n".join(lines) + "\n"
+
+    @staticmethod
+    def _write_atomic(path: str, content: str):
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            f.write(content)
+        os.replace(tmp_path, path)
+
+    def export(self):
+        snapshot = self.snapshot()
+        if self.json_path:
+            self._write_atomic(self.json_path, json.dumps(snapshot, indent=2))
+        if self.prometheus_path:
+            self._write_atomic(self.prometheus_path, self.to_prometheus(snapshot))
+
+    def _run(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.export()
+            except Exception as e:
+                print(f"Error: {str(e)}")
+
+    def close(self):
+        self._stop.set()
+        self._thread.join()
+        self.refresh_gauges(force=True)
+        self.export()
+
+
+class TimedSink(DatasetSink):
+    """Reports the time spent writing and committing to the wrapped sink."""
+
+    def __init__(self, sink: DatasetSink, service):
+        self.sink = sink
+        self.service = service
+
+    @property
+    def pending_batches(self) -> int:
+        return self.sink.pending_batches
+
+    def write(self, rows: List[DatasetRow]):
+        with self.service.stage("write"):
+            self.sink.write(rows)
+        self.service.count("rows_written", len(rows))
+
+    def flush(self):
+        with self.service.stage("write"):
+            self.sink.flush()
+
+    def close(self):
+        with self.service.stage("write"):
+            self.sink.close()
+
+
+@contextmanager
+def timed(hooks: List[TelemetryHook], stage: str):
+    if not hooks:
+        yield
+        return
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        seconds = time.perf_counter() - start
+        for hook in hooks:
+            hook.on_stage(stage, seconds)
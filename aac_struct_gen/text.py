@@ -0,0 +1,20 @@
+import re
+from typing import Optional
+import unidecode
+
+
+NON_ALNUM = r"[^a-z0-9\s]"
+
+
+def normalize_word(word: str) -> str:
+    return " ".join(word.split()).casefold()
+
+
+def clean_text(text) -> Optional[str]:
+    # Anything that is not a string (NaN from pandas included) has no key.
+    if not isinstance(text, str):
+        return None
+    text = text.lower()
+    text = unidecode.unidecode(text)
+    text = re.sub(NON_ALNUM, "", text)
+    return text.strip()
@@ -0,0 +1,182 @@
+import json
+import os
+import shutil
+from typing import Dict, Iterator, List, Optional, Tuple
+import numpy as np
+import pandas as pd
+from .columnar import is_columnar, read_cards, table_to_frame
+from .sharding import shard_of
+
+SPLITS = ("train", "validation")
+# Hash buckets for the train/validation assignment: val_fraction is
+# honoured to 0.01%.
+SPLIT_BUCKETS = 10_000
+
+
+def load_tokenizer(name_or_path: str):
+    # A tokenizer.json on disk, or a Hugging Face Hub model name.
+    from tokenizers import Tokenizer
+    if os.path.exists(name_or_path):
+        return Tokenizer.from_file(name_or_path)
+    return Tokenizer.from_pretrained(name_or_path)
+
+
+def split_of(text: str, val_fraction: float) -> str:
+    # Keyed on the normalized input, so a word lands in the same split in
+    # every export and its spelling variants cannot straddle both.
+    bucket = shard_of(text, SPLIT_BUCKETS)
+    return "validation" if bucket < val_fraction * SPLIT_BUCKETS else "train"
+
+
+def token_dtype(vocab_size: int) -> np.dtype:
+    return np.dtype(np.uint16) if vocab_size <= np.iinfo(np.uint16).max + 1 else np.dtype(np.uint32)
+
+
+def dataset_frames(path: str, chunksize: int) -> Iterator[pd.DataFrame]:
+    if is_columnar(path):
+        for batch in read_cards(path).to_batches(chunksize):
+            yield table_to_frame(batch)
+        return
+    for chunk in pd.read_csv(path, dtype=str, keep_default_na=False, chunksize=chunksize):
+        yield chunk
+
+
+class SplitWriter:
+    """Appends examples of one split to its three flat binary files.
+
+    ``<split>.tokens.bin`` holds every example's tokens back to back,
+    ``<split>.offsets.bin`` (uint64) the start of each example plus the
+    end of the last, and ``<split>.prompt_lengths.bin`` (uint32) how many
+    leading tokens of each example are the prompt.
+    """
+
+    def __init__(self, directory: str, split: str, dtype: np.dtype):
+        self.dtype = dtype
+        self.tokens = open(os.path.join(directory, f"{split}.tokens.bin"), "wb")
+        self.offsets = open(os.path.join(directory, f"{split}.offsets.bin"), "wb")
+        self.prompt_lengths = open(os.path.join(directory, f"{split}.prompt_lengths.bin"), "wb")
+        self.examples = 0
+        self.num_tokens = 0
+        self.offsets.write(np.zeros(1, dtype=np.uint64).tobytes())
+
+    def write(self, examples: List[Tuple[List[int], int]]):
+        if not examples:
+            return
+        lengths = np.fromiter((len(ids) for ids, _ in examples), dtype=np.uint64, count=len(examples))
+        tokens = np.fromiter(
+            (token for ids, _ in examples for token in ids), dtype=self.dtype, count=int(lengths.sum())
+        )
+        self.tokens.write(tokens.tobytes())
+        self.offsets.write((np.cumsum(lengths) + np.uint64(self.num_tokens)).tobytes())
+        self.prompt_lengths.write(
+            np.fromiter((length for _, length in examples), dtype=np.uint32, count=len(examples)).tobytes()
+        )
+        self.examples += len(examples)
+        self.num_tokens += int(lengths.sum())
+
+    def close(self):
+        self.tokens.close()
+        self.offsets.close()
+        self.prompt_lengths.close()
+
+
+def export_tokens(
+    dataset_path: str,
+    output_dir: str,
+    tokenizer_name: str,
+    val_fraction: float = 0.02,
+    separator: str = "\n",
+    eos_token: Optional[str] = None,
+    chunksize: int = 50_000,
+) -> Dict[str, Dict[str, int]]:
+    """Tokenizes ``input + separator`` as the prompt and ``output`` (plus
+    ``eos_token``) as the completion of every row, once.
+
+    ``encode_batch`` tokenizes each chunk on all cores. Everything is
+    written to ``<output_dir>.tmp`` and renamed into place at the end, with
+    the tokenizer, dtype and per-split counts in ``meta.json``.
+    """
+    tokenizer = load_tokenizer(tokenizer_name)
+    vocab_size = tokenizer.get_vocab_size(with_added_tokens=True)
+    dtype = token_dtype(vocab_size)
+    eos = []
+    if eos_token is not None:
+        eos_id = tokenizer.token_to_id(eos_token)
+        if eos_id is None:
+            raise ValueError(f"Token {eos_token!r} is not in the tokenizer vocabulary")
+        eos = [eos_id]
+
+    tmp_dir = f"{output_dir}.tmp"
+    if os.path.exists(tmp_dir):
+        shutil.rmtree(tmp_dir)
+    os.makedirs(tmp_dir)
+    writers = {split: SplitWriter(tmp_dir, split, dtype) for split in SPLITS}
+    try:
+        for frame in dataset_frames(dataset_path, chunksize):
+            inputs = frame["input"].tolist()
+            prompts = tokenizer.encode_batch([text + separator for text in inputs], add_special_tokens=False)
+            completions = tokenizer.encode_batch(frame["output"].tolist(), add_special_tokens=False)
+            by_split: Dict[str, List[Tuple[List[int], int]]] = {split: [] for split in SPLITS}
+            for text, prompt, completion in zip(inputs, prompts, completions):
+                by_split[split_of(text, val_fraction)].append(
+                    (prompt.ids + completion.ids + eos, len(prompt.ids))
+                )
+            for split, examples in by_split.items():
+                writers[split].write(examples)
+    finally:
+        for writer in writers.values():
+            writer.close()
+
+    counts = {
+        split: {"examples": writer.examples, "tokens": writer.num_tokens}
+        for split, writer in writers.items()
+    }
+    with open(os.path.join(tmp_dir, "meta.json"), "w", encoding="utf-8") as f:
+        json.dump(
+            {
+                "source": dataset_path,
+                "tokenizer": tokenizer_name,
+                "vocab_size": vocab_size,
+                "dtype": dtype.name,
+                "separator": separator,
+                "eos_token": eos_token,
+                "val_fraction": val_fraction,
+                "splits": counts,
+            },
+            f,
+            indent=2,
+        )
+    if os.path.exists(output_dir):
+        shutil.rmtree(output_dir)
+    os.replace(tmp_dir, output_dir)
+    return counts
+
+
+class TokenDataset:
+    """Read side of ``export_tokens``: memory-maps one split.
+
+    ``dataset[i]`` is ``(tokens, prompt_length)`` where ``tokens`` is a
+    view into the mapped file, so nothing is copied or re-tokenized.
+    """
+
+    def __init__(self, directory: str, split: str = "train"):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            self.meta = json.load(f)
+        dtype = np.dtype(self.meta["dtype"])
+
+        def mapped(name: str, file_dtype: np.dtype) -> np.ndarray:
+            path = os.path.join(directory, f"{split}.{name}.bin")
+            if not os.path.getsize(path):
+                return np.zeros(0, dtype=file_dtype)
+            return np.memmap(path, dtype=file_dtype, mode="r")
+
+        self.tokens = mapped("tokens", dtype)
+        self.offsets = mapped("offsets", np.dtype(np.uint64))
+        self.prompt_lengths = mapped("prompt_lengths", np.dtype(np.uint32))
+
+    def __len__(self) -> int:
+        return len(self.prompt_lengths)
+
+    def __getitem__(self, index: int) -> Tuple[np.ndarray, int]:
+        start, end = self.offsets[index], self.offsets[index + 1]
+        return self.tokens[start:end], int(self.prompt_lengths[index])
@@ -0,0 +1,115 @@
+import json
+import threading
+import time
+from dataclasses import asdict, dataclass
+from typing import Any, Dict, Optional, Tuple
+
+
+# USD per million tokens: (input, cached input, output).
+PRICES_PER_MILLION: Dict[str, Tuple[float, float, float]] = {
+    "gpt-4o-mini": (0.15, 0.075, 0.60),
+    "gpt-4o": (2.50, 1.25, 10.00),
+    "gpt-4.1-mini": (0.40, 0.10, 1.60),
+    "gpt-4.1": (2.00, 0.50, 8.00),
+}
+
+
+def model_prices(model: str) -> Tuple[float, float, float]:
+    # Longest matching prefix, so dated snapshots map to their family.
+    for name in sorted(PRICES_PER_MILLION, key=len, reverse=True):
+        if model.startswith(name):
+            return PRICES_PER_MILLION[name]
+    return (0.0, 0.0, 0.0)
+
+
+@dataclass
+class UsageTotals:
+    requests: int = 0
+    prompt_tokens: int = 0
+    cached_tokens: int = 0
+    completion_tokens: int = 0
+
+
+class UsageTracker:
+    """Per-request token accounting aggregated per model.
+
+    ``record`` takes the ``usage`` object of a chat-completions response.
+    With ``log_path`` every request is also appended as a JSON line.
+    """
+
+    def __init__(self, log_path: Optional[str] = None):
+        self.log_path = log_path
+        self.totals: Dict[str, UsageTotals] = {}
+        self._lock = threading.Lock()
+
+    def __getstate__(self):
+        # distilabel pickles LLMs into its step processes; locks cannot be.
+        state = self.__dict__.copy()
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def record(self, model: str, usage: Dict[str, Any], latency: Optional[float] = None):
+        prompt_tokens = int(usage.get("prompt_tokens") or 0)
+        completion_tokens = int(usage.get("completion_tokens") or 0)
+        details = usage.get("prompt_tokens_details") or {}
+        cached_tokens = int(details.get("cached_tokens") or 0)
+        with self._lock:
+            totals = self.totals.setdefault(model, UsageTotals())
+            totals.requests += 1
+            totals.prompt_tokens += prompt_tokens
+            totals.cached_tokens += cached_tokens
+            totals.completion_tokens += completion_tokens
+            if self.log_path:
+                with open(self.log_path, "a", encoding="utf-8") as f:
+                    f.write(
+                        json.dumps(
+                            {
+                                "time": time.time(),
+                                "model": model,
+                                "prompt_tokens": prompt_tokens,
+                                "cached_tokens": cached_tokens,
+                                "completion_tokens": completion_tokens,
+                                "latency": latency,
+                            }
+                        )
+                        + "\n"
+                    )
+
+    @staticmethod
+    def summarize(model: str, totals: UsageTotals) -> Dict[str, Any]:
+        input_price, cached_price, output_price = model_prices(model)
+        uncached = totals.prompt_tokens - totals.cached_tokens
+        cost = (
+            uncached * input_price
+            + totals.cached_tokens * cached_price
+            + totals.completion_tokens * output_price
+        ) / 1_000_000
+        savings = totals.cached_tokens * (input_price - cached_price) / 1_000_000
+        return {
+            **asdict(totals),
+            "cache_hit_rate": totals.cached_tokens / totals.prompt_tokens if totals.prompt_tokens else 0.0,
+            "prompt_tokens_per_request": totals.prompt_tokens / totals.requests if totals.requests else 0.0,
+            "cost_usd": round(cost, 6),
+            "cache_savings_usd": round(savings, 6),
+        }
+
+    def report(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            report = {model: self.summarize(model, totals) for model, totals in self.totals.items()}
+            combined = UsageTotals()
+            for totals in self.totals.values():
+                combined.requests += totals.requests
+                combined.prompt_tokens += totals.prompt_tokens
+                combined.cached_tokens += totals.cached_tokens
+                combined.completion_tokens += totals.completion_tokens
+        total = self.summarize("", combined)
+        total["cost_usd"] = round(sum(entry["cost_usd"] for entry in report.values()), 6)
+        total["cache_savings_usd"] = round(
+            sum(entry["cache_savings_usd"] for entry in report.values()), 6
+        )
+        report["total"] = total
+        return report
@@ -1,10 +1,39 @@
 import os
+from typing import Optional
 from dotenv import load_dotenv
 from distilabel.llms import OpenAILLM
+from .engine import ChatCompletionsLLM
+from .routing import RoutingLLM, load_endpoints
+# Re-exported; they live in .text so offline modules need no LLM stack.
+from .text import clean_text, normalize_word
 
 def load_environment():
     load_dotenv()
     return os.environ["OPENAI_API_KEY"]
 
 def initialize_llm(api_key: str, model_name: str = "gpt-4o-mini"):
-    return OpenAILLM(model=model_name, api_key=api_key)
\ No newline at end of file
+    return OpenAILLM(model=model_name, api_key=api_key)
+
+def initialize_async_llm(
+    api_key: str,
+    model_name: str = "gpt-4o-mini",
+    base_url: str = "https://api.openai.com/v1",
+    max_concurrency: int = 16,
+    rpm: Optional[float] = None,
+    tpm: Optional[float] = None,
+    usage_log: Optional[str] = None,
+):
+    return ChatCompletionsLLM(
+        model=model_name,
+        api_key=api_key,
+        base_url=base_url,
+        max_concurrency=max_concurrency,
+        rpm=rpm,
+        tpm=tpm,
+        usage_log=usage_log,
+    )
+
+def initialize_routing_llm(endpoints_file: str, usage_log: Optional[str] = None) -> RoutingLLM:
+    # Keys come from the environment (and .env), one variable per endpoint.
+    load_dotenv()
+    return load_endpoints(endpoints_file, usage_log=usage_log)
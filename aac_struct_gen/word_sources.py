@@ -0,0 +1,187 @@
+import csv
+import gzip
+import json
+import re
+from typing import Any, Iterator, Optional, TextIO
+
+CHUNK_SIZE = 1 << 16
+WHITESPACE_OR_COMMA = re.compile(r"[\s,]*")
+
+
+def _open_text(path: str) -> TextIO:
+    if path.endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, "r", encoding="utf-8", newline="")
+
+
+def _word(value: Any, key: Optional[str]) -> Optional[str]:
+    # Entries are either plain strings or objects holding the word in ``key``.
+    if isinstance(value, dict):
+        value = value.get(key) if key else None
+    if not isinstance(value, str):
+        return None
+    value = value.strip()
+    return value or None
+
+
+class WordSource:
+    """An input word list read incrementally from a file.
+
+    Iterating opens the file again, so a source can be read more than once
+    (a planning pass, then the run); memory use does not depend on the file
+    size. Entries are stripped and blank ones skipped. ``.gz`` files are
+    decompressed on the fly.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def __iter__(self) -> Iterator[str]:
+        with _open_text(self.path) as f:
+            for value in self._values(f):
+                word = self._word(value)
+                if word is not None:
+                    yield word
+
+    def _values(self, f: TextIO) -> Iterator[Any]:
+        raise NotImplementedError
+
+    def _word(self, value: Any) -> Optional[str]:
+        return _word(value, None)
+
+
+class JsonArraySource(WordSource):
+    """A JSON array, at the top level or under the first ``key`` found,
+    e.g. ``{"words": [...]}`` for ``arasaac_br.json``. Elements are decoded
+    one at a time from a fixed-size buffer."""
+
+    def __init__(self, path: str, key: Optional[str] = "words", field: Optional[str] = None, chunk_size: int = CHUNK_SIZE):
+        super().__init__(path)
+        self.key = key
+        self.field = field
+        self.chunk_size = chunk_size
+
+    def _word(self, value: Any) -> Optional[str]:
+        return _word(value, self.field)
+
+    def _values(self, f: TextIO) -> Iterator[Any]:
+        start = re.compile(r"\[" if self.key is None else rf'"{re.escape(self.key)}"\s*:\s*\[')
+        buffer = ""
+        while True:
+            match = start.search(buffer)
+            if match:
+                buffer = buffer[match.end():]
+                break
+            chunk = f.read(self.chunk_size)
+            if not chunk:
+                raise ValueError(f"No JSON array {'under ' + repr(self.key) if self.key else ''} in {self.path}")
+            # Keep a tail so a match split across two chunks is still found.
+            buffer = buffer[-256:] + chunk
+
+        decoder = json.JSONDecoder()
+        position = 0
+        eof = False
+        while True:
+            position = WHITESPACE_OR_COMMA.match(buffer, position).end()
+            if position < len(buffer) and buffer[position] == "]":
+                return
+            try:
+                if position >= len(buffer):
+                    raise json.JSONDecodeError("more input needed", buffer, position)
+                value, end = decoder.raw_decode(buffer, position)
+                # A number at the very end of the buffer may continue.
+                if end == len(buffer) and not eof:
+                    raise json.JSONDecodeError("more input needed", buffer, end)
+            except json.JSONDecodeError:
+                if eof:
+                    raise ValueError(f"Truncated JSON array in {self.path}")
+                chunk = f.read(self.chunk_size)
+                eof = not chunk
+                buffer = buffer[position:] + chunk
+                position = 0
+                continue
+            yield value
+            position = end
+
+
+class JsonLinesSource(WordSource):
+    """One JSON value per line: a string, or an object with ``field``."""
+
+    def __init__(self, path: str, field: Optional[str] = "word"):
+        super().__init__(path)
+        self.field = field
+
+    def _word(self, value: Any) -> Optional[str]:
+        return _word(value, self.field)
+
+    def _values(self, f: TextIO) -> Iterator[Any]:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+class CsvSource(WordSource):
+    """The ``column`` of a CSV file with a header row (tab-separated for ``.tsv``)."""
+
+    def __init__(self, path: str, column: str = "input", delimiter: Optional[str] = None):
+        super().__init__(path)
+        self.column = column
+        self.delimiter = delimiter or ("\t" if path.endswith((".tsv", ".tsv.gz")) else ",")
+
+    def _values(self, f: TextIO) -> Iterator[Any]:
+        reader = csv.DictReader(f, delimiter=self.delimiter)
+        if reader.fieldnames is None:
+            return
+        if self.column not in reader.fieldnames:
+            raise ValueError(f"Column {self.column!r} not in {self.path}")
+        for row in reader:
+            yield row[self.column]
+
+
+class TextSource(WordSource):
+    """One word per line. With ``delimiter``, only field ``column`` of each
+    line is used, e.g. the word of a "word<TAB>count" frequency list."""
+
+    def __init__(self, path: str, delimiter: Optional[str] = None, column: int = 0):
+        super().__init__(path)
+        self.delimiter = delimiter
+        self.column = column
+
+    def _values(self, f: TextIO) -> Iterator[Any]:
+        for line in f:
+            if self.delimiter is None:
+                yield line
+                continue
+            fields = line.rstrip("\r\n").split(self.delimiter)
+            if self.column < len(fields):
+                yield fields[self.column]
+
+
+def open_word_source(
+    path: str,
+    format: Optional[str] = None,
+    key: Optional[str] = "words",
+    field: Optional[str] = None,
+    column: str = "input",
+) -> WordSource:
+    # ``format`` is "json", "jsonl", "csv" or "text"; by default it follows
+    # the file extension, ignoring a trailing ".gz".
+    if format is None:
+        name = path[:-3] if path.endswith(".gz") else path
+        extension = name.rsplit(".", 1)[-1].lower() if "." in name else ""
+        format = {
+            "json": "json",
+            "jsonl": "jsonl",
+            "ndjson": "jsonl",
+            "csv": "csv",
+            "tsv": "csv",
+        }.get(extension, "text")
+    if format == "json":
+        return JsonArraySource(path, key=key, field=field)
+    if format == "jsonl":
+        return JsonLinesSource(path, field=field or "word")
+    if format == "csv":
+        return CsvSource(path, column=column)
+    if format == "text":
+        return TextSource(path)
+    raise ValueError(f"Unknown word source format: {format}")
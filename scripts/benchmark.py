@@ -0,0 +1,204 @@
+import argparse
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+from typing import Dict, List
+os.environ.setdefault("TQDM_DISABLE", "1")
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))
+from aac_struct_gen.services import AACService
+from aac_struct_gen.fakes import FakeLLM
+from aac_struct_gen.sinks import SinkConfig
+from generate_arasaac import ArasaacConfig, ArasaacProcessor
+
+# Metrics where a larger value is an improvement; everything else is a cost.
+HIGHER_IS_BETTER = {"words_per_sec"}
+
+
+class Timer:
+    def __init__(self):
+        self.total = 0.0
+        self.calls = 0
+
+    def wrap(self, fn):
+        def timed(*args, **kwargs):
+            start = time.perf_counter()
+            try:
+                return fn(*args, **kwargs)
+            finally:
+                self.total += time.perf_counter() - start
+                self.calls += 1
+
+        return timed
+
+
+class BenchmarkService(AACService):
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.parse_timer = Timer()
+        self.write_timer = Timer()
+        self.parse_card = self.parse_timer.wrap(self.parse_card)
+        self.parse_packed_cards = self.parse_timer.wrap(self.parse_packed_cards)
+
+    def get_sink(self, dataset_path: str):
+        sink = super().get_sink(dataset_path)
+        if not hasattr(sink, "_benchmark_wrapped"):
+            sink.write = self.write_timer.wrap(sink.write)
+            sink.flush = self.write_timer.wrap(sink.flush)
+            sink._benchmark_wrapped = True
+        return sink
+
+
+class BenchmarkProcessor(ArasaacProcessor):
+    def __init__(self, config: ArasaacConfig, aac_service: AACService, words: List[str]):
+        super().__init__(config, aac_service)
+        self.words = words
+        self.batch_latencies: List[float] = []
+
+    def load_words(self) -> List[str]:
+        return self.words
+
+    def _timed(self, results):
+        start = time.perf_counter()
+        for result in results:
+            self.batch_latencies.append(time.perf_counter() - start)
+            yield result
+            start = time.perf_counter()
+
+    def _batch_results(self, words, progress):
+        return self._timed(super()._batch_results(words, progress))
+
+    def _stream_results(self, words, progress):
+        return self._timed(super()._stream_results(words, progress))
+
+
+def percentile(values: List[float], q: float) -> float:
+    if not values:
+        return 0.0
+    if len(values) == 1:
+        return values[0]
+    return statistics.quantiles(values, n=100, method="inclusive")[int(q) - 1]
+
+
+def run_size(size: int, args, pack_size: int) -> Dict[str, float]:
+    words = [f"palavra {index}" for index in range(size)]
+    with tempfile.TemporaryDirectory() as workdir:
+        config = ArasaacConfig(
+            batch_size=args.batch_size,
+            output_file=str(Path(workdir) / "dataset.csv"),
+            state_file=str(Path(workdir) / "progress.sqlite"),
+            streaming=args.mode == "stream",
+            max_in_flight=args.max_in_flight,
+            pack_size=pack_size,
+            # Nothing outside the temporary directory is read or written.
+            generated_index=None,
+            known_datasets=[],
+        )
+        llm = FakeLLM(
+            seed=args.seed,
+            latency=args.latency,
+            latency_distribution=args.latency_distribution,
+            token_latency=args.token_latency,
+            failure_rate=args.failure_rate,
+        )
+        service = BenchmarkService(
+            llm,
+            SinkConfig(fsync=args.fsync),
+            streaming=config.streaming,
+            max_in_flight=config.max_in_flight,
+            pack_size=config.pack_size,
+        )
+        processor = BenchmarkProcessor(config, service, words)
+
+        start = time.perf_counter()
+        processor.process_all_words()
+        elapsed = time.perf_counter() - start
+
+    usage = service.usage_report()["total"]
+    return {
+        "words": size,
+        "seconds": elapsed,
+        "words_per_sec": size / elapsed if elapsed else 0.0,
+        "batch_p50": percentile(processor.batch_latencies, 50),
+        "batch_p95": percentile(processor.batch_latencies, 95),
+        "parse_seconds": service.parse_timer.total,
+        "write_seconds": service.write_timer.total,
+        "prompt_tokens_per_word": usage["prompt_tokens"] / size if size else 0.0,
+        "tokens_per_card": (usage["prompt_tokens"] + usage["completion_tokens"]) / size if size else 0.0,
+        "requests_per_card": usage["requests"] / size if size else 0.0,
+        "seconds_per_card": elapsed / size if size else 0.0,
+    }
+
+
+def compare(results: Dict[str, Dict[str, float]], baseline: Dict[str, Dict[str, float]], tolerance: float) -> bool:
+    ok = True
+    for size, metrics in results.items():
+        reference = baseline.get(size)
+        if not reference:
+            continue
+        for name, value in metrics.items():
+            if name in ("words", "seconds") or not reference.get(name):
+                continue
+            ratio = value / reference[name]
+            regressed = ratio < 1 - tolerance if name in HIGHER_IS_BETTER else ratio > 1 + tolerance
+            marker = "REGRESSION" if regressed else "ok"
+            print(f"  {size:>7} {name:<14} {reference[name]:>12.4f} -> {value:>12.4f} ({ratio:.2f}x) {marker}")
+            ok = ok and not regressed
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Offline throughput benchmark for card generation")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1000, 10000, 100000])
+    parser.add_argument("--mode", choices=["stream", "pipeline"], default="stream")
+    parser.add_argument("--batch-size", type=int, default=10)
+    parser.add_argument("--max-in-flight", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.0)
+    parser.add_argument("--latency-distribution", default="constant")
+    parser.add_argument("--token-latency", type=float, default=0.0, help="seconds per completion token")
+    parser.add_argument("--pack-size", type=int, default=1, help="words per card request")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--fsync", action="store_true")
+    parser.add_argument("--baseline", default="benchmark_baseline.json")
+    parser.add_argument("--save-baseline", action="store_true")
+    parser.add_argument("--tolerance", type=float, default=0.1)
+    args = parser.parse_args()
+
+    results = {}
+    for size in args.sizes:
+        metrics = run_size(size, args, args.pack_size)
+        results[str(size)] = metrics
+        print(
+            f"{size:>7} words: {metrics['words_per_sec']:.1f} words/s, "
+            f"batch p50 {metrics['batch_p50'] * 1000:.2f} ms, p95 {metrics['batch_p95'] * 1000:.2f} ms, "
+            f"parse {metrics['parse_seconds']:.3f} s, write {metrics['write_seconds']:.3f} s, "
+            f"{metrics['tokens_per_card']:.0f} tokens/card"
+        )
+        if args.pack_size > 1:
+            single = run_size(size, args, 1)
+            for name in ("tokens_per_card", "requests_per_card", "seconds_per_card"):
+                saving = 1 - metrics[name] / single[name] if single[name] else 0.0
+                print(
+                    f"  {name:<18} pack 1: {single[name]:.4f}, "
+                    f"pack {args.pack_size}: {metrics[name]:.4f} ({saving:.1%} saved)"
+                )
+
+    if args.save_baseline:
+        with open(args.baseline, "w", encoding="utf-8") as f:
+            json.dump(results, f, indent=2)
+        print(f"Baseline saved to {args.baseline}")
+    elif Path(args.baseline).exists():
+        with open(args.baseline, "r", encoding="utf-8") as f:
+            baseline = json.load(f)
+        print(f"Comparison against {args.baseline}:")
+        if not compare(results, baseline, args.tolerance):
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
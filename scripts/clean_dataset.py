@@ -0,0 +1,74 @@
+import argparse
+import filecmp
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aac_struct_gen.cleaning import DatasetCleaner, clean_text, duplicate_report
+
+
+def legacy_clean(input_path: str, output_path: str):
+    # The original row-by-row loop from filtering_data.ipynb, kept as the
+    # reference for --benchmark.
+    df = pd.read_csv(input_path)
+    cleaned_data = {}
+    for _, row in df.iterrows():
+        input_text = clean_text(row["input"])
+        output_text = row["output"]
+        valid = isinstance(output_text, str) and len(output_text.strip().split("\n")) == 5
+        if valid and input_text not in cleaned_data:
+            cleaned_data[input_text] = output_text
+    pd.DataFrame([{"input": k, "output": v} for k, v in cleaned_data.items()]).to_csv(
+        output_path, index=False
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Clean and deduplicate a generated dataset")
+    parser.add_argument("--input", default="dataset_with_arasaac.csv")
+    parser.add_argument("--output", default="cleaned_dataset.csv")
+    parser.add_argument("--report", default="duplicate_analysis.csv")
+    parser.add_argument("--chunksize", type=int, default=100_000)
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"File {args.input} not found")
+        return
+
+    start = time.perf_counter()
+    cleaner = DatasetCleaner(args.chunksize)
+    stats = cleaner.clean_csv(args.input, args.output)
+    elapsed = time.perf_counter() - start
+
+    print(f"Original dataset size: {stats.total_rows}")
+    print(f"Cleaned dataset size: {stats.kept_rows}")
+    print(f"Removed entries: {stats.total_rows - stats.kept_rows}")
+    print(f"Invalid outputs removed: {stats.invalid_rows}")
+    print(f"Duplicate inputs removed: {stats.duplicate_rows}")
+
+    report = duplicate_report(args.output, args.report, args.chunksize)
+    if report.empty:
+        print("Success! No duplicate inputs found.")
+    else:
+        print(report.head(50))
+        print(f"\nTotal unique inputs with duplicates: {len(report)}")
+
+    if args.benchmark:
+        with tempfile.TemporaryDirectory() as workdir:
+            legacy_output = str(Path(workdir) / "legacy.csv")
+            start = time.perf_counter()
+            legacy_clean(args.input, legacy_output)
+            legacy_elapsed = time.perf_counter() - start
+            identical = filecmp.cmp(legacy_output, args.output, shallow=False)
+        print(
+            f"\niterrows: {legacy_elapsed:.2f} s, chunked: {elapsed:.2f} s "
+            f"({legacy_elapsed / elapsed:.1f}x), identical output: {identical}"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+import pyarrow as pa
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aac_struct_gen.columnar import (
+    ParquetDatasetSink,
+    frame_to_table,
+    is_columnar,
+    read_cards,
+    table_to_rows,
+    write_arrow,
+)
+from aac_struct_gen.sinks import SinkConfig, open_sink
+
+
+def csv_tables(path: str, chunksize: int):
+    for chunk in pd.read_csv(path, dtype=str, chunksize=chunksize):
+        yield frame_to_table(chunk)
+
+
+def path_size(path: str) -> int:
+    if os.path.isdir(path):
+        return sum(entry.stat().st_size for entry in os.scandir(path))
+    return os.path.getsize(path)
+
+
+def benchmark(csv_path: str, columnar_path: str):
+    start = time.perf_counter()
+    frame = pd.read_csv(csv_path, dtype=str)
+    options = frame["output"].fillna("").str.split("\n")
+    csv_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    table = read_cards(columnar_path)
+    columnar_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    inputs = read_cards(columnar_path, columns=["input"])
+    projected_seconds = time.perf_counter() - start
+
+    print(f"CSV + split:        {csv_seconds * 1000:8.1f} ms, {path_size(csv_path) / 1e6:.2f} MB on disk")
+    print(
+        f"columnar:           {columnar_seconds * 1000:8.1f} ms, {path_size(columnar_path) / 1e6:.2f} MB on disk, "
+        f"{table.nbytes / 1e6:.2f} MB in memory ({csv_seconds / columnar_seconds:.1f}x)"
+    )
+    print(
+        f"columnar (input):   {projected_seconds * 1000:8.1f} ms, {inputs.nbytes / 1e6:.2f} MB in memory "
+        f"({csv_seconds / projected_seconds:.1f}x)"
+    )
+    assert len(options) == table.num_rows
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Convert a dataset between CSV and the columnar formats (.parquet directory or .arrow file)"
+    )
+    parser.add_argument("--input", default="dataset_wo_arasaac.csv")
+    parser.add_argument("--output", default="dataset_wo_arasaac.parquet")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--benchmark", action="store_true")
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"File {args.input} not found")
+        return
+
+    start = time.perf_counter()
+    if is_columnar(args.input) and args.output.endswith(".arrow"):
+        batches = read_cards(args.input).to_batches(args.chunksize)
+        rows = write_arrow((pa.Table.from_batches([batch]) for batch in batches), args.output)
+    elif is_columnar(args.input):
+        rows = 0
+        with open_sink(args.output, SinkConfig()) as sink:
+            for batch in read_cards(args.input).to_batches(args.chunksize):
+                batch_rows = list(table_to_rows(pa.Table.from_batches([batch])))
+                sink.write(batch_rows)
+                rows += len(batch_rows)
+    elif args.output.endswith(".arrow"):
+        rows = write_arrow(csv_tables(args.input, args.chunksize), args.output)
+    else:
+        rows = 0
+        # One part file (and row group) per chunk.
+        with ParquetDatasetSink(args.output, SinkConfig(buffer_batches=1)) as sink:
+            for table in csv_tables(args.input, args.chunksize):
+                sink.write_table(table)
+                rows += table.num_rows
+    print(f"Converted {rows} rows to {args.output} in {time.perf_counter() - start:.2f} s")
+
+    if args.benchmark and not is_columnar(args.input):
+        benchmark(args.input, args.output)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aac_struct_gen.token_export import SPLITS, TokenDataset, export_tokens
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Tokenize a dataset once into memory-mappable token files with a train/validation split"
+    )
+    parser.add_argument("--input", default="cleaned_dataset.csv", help="CSV, .parquet or .arrow dataset")
+    parser.add_argument("--output", default="tokens", help="output directory")
+    parser.add_argument("--tokenizer", required=True, help="tokenizer.json path or Hugging Face model name")
+    parser.add_argument("--val-fraction", type=float, default=0.02)
+    parser.add_argument("--separator", default="\n", help="text between input and output")
+    parser.add_argument("--eos-token", default=None, help="token appended to every output, e.g. </s>")
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    parser.add_argument("--threads", type=int, default=None, help="tokenizer threads (default: all cores)")
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"File {args.input} not found")
+        return
+    if args.threads:
+        # Read by the tokenizers thread pool when it starts.
+        os.environ["RAYON_NUM_THREADS"] = str(args.threads)
+
+    start = time.perf_counter()
+    try:
+        counts = export_tokens(
+            args.input,
+            args.output,
+            args.tokenizer,
+            val_fraction=args.val_fraction,
+            separator=args.separator,
+            eos_token=args.eos_token,
+            chunksize=args.chunksize,
+        )
+    except Exception as e:
+        print(f"Error: {str(e)}")
+        sys.exit(1)
+    seconds = time.perf_counter() - start
+    tokens = sum(split["tokens"] for split in counts.values())
+    for split in SPLITS:
+        print(f"{split}: {counts[split]['examples']} examples, {counts[split]['tokens']} tokens")
+    print(f"Exported to {args.output} in {seconds:.2f} s ({tokens / max(seconds, 1e-9):,.0f} tokens/s)")
+
+    start = time.perf_counter()
+    dataset = TokenDataset(args.output, "train")
+    read_tokens = sum(len(dataset[index][0]) for index in range(len(dataset)))
+    print(f"Read back {read_tokens} train tokens through the memory map in {time.perf_counter() - start:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,94 @@
+import argparse
+import csv
+import os
+import sys
+import time
+from pathlib import Path
+import pandas as pd
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aac_struct_gen.models import DatasetRow
+from aac_struct_gen.near_duplicates import NearDuplicateIndex, row_key
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find near-duplicate cards with MinHash/LSH")
+    parser.add_argument("--input", default="dataset_with_arasaac.csv")
+    parser.add_argument("--index", default="near_duplicates.sqlite")
+    parser.add_argument("--report", default="near_duplicate_clusters.csv")
+    parser.add_argument("--output", default=None, help="write the dataset without near-duplicates")
+    parser.add_argument("--threshold", type=float, default=0.8)
+    parser.add_argument("--num-perm", type=int, default=64)
+    parser.add_argument("--chunksize", type=int, default=50_000)
+    args = parser.parse_args()
+
+    if not Path(args.input).exists():
+        print(f"File {args.input} not found")
+        return
+
+    start = time.perf_counter()
+    index = NearDuplicateIndex(args.index, num_perm=args.num_perm, threshold=args.threshold)
+    # Exact repeats of a (input, output) pair share one row key; they are
+    # counted here and dropped before LSH, which only sees the first copy.
+    index.conn.execute("CREATE TEMP TABLE copies (row_key TEXT PRIMARY KEY, count INTEGER)")
+    added = 0
+    for chunk in pd.read_csv(args.input, dtype=str, chunksize=args.chunksize):
+        for input_text, output_text in zip(chunk["input"].fillna(""), chunk["output"].fillna("")):
+            row = DatasetRow(input=input_text, output=output_text)
+            key = row_key(row)
+            if not index.conn.execute(
+                "UPDATE temp.copies SET count = count + 1 WHERE row_key = ?", (key,)
+            ).rowcount:
+                index.conn.execute("INSERT INTO temp.copies (row_key, count) VALUES (?, 1)", (key,))
+                if index.add(row) is not None:
+                    added += 1
+        index.commit()
+    print(f"Indexed {added} new rows in {time.perf_counter() - start:.1f} s")
+
+    copies = dict(index.conn.execute(
+        "SELECT s.id, c.count FROM signatures s JOIN temp.copies c USING (row_key) WHERE c.count > 1"
+    ))
+    clusters = index.clusters()
+    clustered = {row_id for members in clusters for row_id in members}
+    clusters += [[row_id] for row_id in sorted(copies) if row_id not in clustered]
+    with open(args.report, "w", encoding="utf-8", newline="") as f:
+        writer = csv.writer(f)
+        writer.writerow(["cluster", "size", "copies", "input"])
+        for cluster_id, members in enumerate(clusters):
+            size = sum(copies.get(row_id, 1) for row_id in members)
+            for row_id, input_text in zip(members, index.inputs(members)):
+                writer.writerow([cluster_id, size, copies.get(row_id, 1), input_text])
+    exact = sum(count - 1 for count in copies.values())
+    duplicates = sum(len(members) - 1 for members in clusters)
+    print(
+        f"Found {len(clusters)} clusters covering {duplicates} near-duplicate rows "
+        f"and {exact} exact copies"
+    )
+
+    if args.output:
+        # The earliest row of each cluster is kept, once.
+        redundant = {
+            row_id for members in clusters for row_id in members[1:]
+        }
+        redundant_keys = {
+            key
+            for (row_id, key) in index.conn.execute("SELECT id, row_key FROM signatures")
+            if row_id in redundant
+        }
+        written = set()
+        header = True
+        for chunk in pd.read_csv(args.input, dtype=str, chunksize=args.chunksize):
+            keep = []
+            for i, o in zip(chunk["input"].fillna(""), chunk["output"].fillna("")):
+                key = row_key(DatasetRow(input=i, output=o))
+                keep.append(key not in redundant_keys and key not in written)
+                written.add(key)
+            chunk[keep].to_csv(
+                args.output, mode="w" if header else "a", header=header, index=False
+            )
+            header = False
+        print(f"Wrote deduplicated dataset to {args.output}")
+    index.close()
+
+
+if __name__ == "__main__":
+    main()
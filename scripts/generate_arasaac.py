@@ -1,36 +1,174 @@
-import json
-from dataclasses import dataclass
+import argparse
+from itertools import islice
+from dataclasses import dataclass, field, replace
 from pathlib import Path
-from typing import List
+from typing import Iterable, Iterator, List, Optional, Tuple
 from tqdm import tqdm
 import os
 import sys
 import traceback
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 from aac_struct_gen.services import AACService
-from aac_struct_gen.utils import load_environment, initialize_llm
+from aac_struct_gen.adaptive import AdaptiveLimits
+from aac_struct_gen.cache import ResponseCache
+from aac_struct_gen.fakes import FakeLLM
+from aac_struct_gen.near_duplicates import NearDuplicateIndex
+from aac_struct_gen.utils import (
+    load_environment,
+    initialize_llm,
+    initialize_async_llm,
+    initialize_routing_llm,
+    normalize_word,
+)
 from aac_struct_gen.models import DatasetRow
+from aac_struct_gen.planning import GeneratedIndex, WordFilters, WordPlanner, estimate_cost
+from aac_struct_gen.progress import ProgressIndex
+from aac_struct_gen.routing import RoutingLLM
+from aac_struct_gen.sharding import shard_of, shard_path
+from aac_struct_gen.prompts import CARD_SYSTEM_PROMPT
+from aac_struct_gen.sinks import SinkConfig
+from aac_struct_gen.telemetry import MetricsExporter
+from aac_struct_gen.word_sources import WordSource, open_word_source
 
 @dataclass
 class ArasaacConfig:
     batch_size: int = 10
     output_file: str = "dataset_with_arasaac.csv"
     input_file: str = "arasaac_br.json"
+    # Words are streamed from input_file: a JSON array (under input_key),
+    # JSON lines, CSV (input_column) or plain text, by extension unless
+    # input_format is set; ".gz" files work too.
+    input_format: Optional[str] = None
+    input_key: Optional[str] = "words"
+    input_column: str = "input"
+    sink_buffer_batches: int = 1
+    sink_fsync: bool = True
+    state_file: str = "dataset_with_arasaac.progress.sqlite"
+    retry_failed: bool = True
+    cache_file: str = "llm_cache.sqlite"
+    cache_read_only: bool = False
+    streaming: bool = False
+    max_in_flight: int = 8
+    # Words per card request; above 1 cards come back as one JSON array.
+    pack_size: int = 1
+    # "distilabel" uses OpenAILLM, "async" the rate-limited ChatCompletionsLLM,
+    # "router" a RoutingLLM over the endpoints in endpoints_file and "fake"
+    # the offline FakeLLM.
+    llm_backend: str = "distilabel"
+    endpoints_file: str = "endpoints.json"
+    max_concurrency: int = 16
+    rpm: Optional[float] = None
+    tpm: Optional[float] = None
+    # Path of a near-duplicate index; when set, near-duplicate cards are
+    # dropped before they reach the dataset.
+    near_duplicate_index: Optional[str] = None
+    near_duplicate_threshold: float = 0.8
+    # Per-request token usage (async backend) as JSON lines.
+    usage_log: Optional[str] = None
+    # Telemetry snapshots, rewritten every metrics_interval seconds; the
+    # Prometheus file is meant for the node_exporter textfile collector.
+    metrics_file: Optional[str] = "dataset_with_arasaac.metrics.json"
+    metrics_prometheus_file: Optional[str] = None
+    metrics_interval: float = 30.0
+    # With num_shards > 1 this process only handles the words whose stable
+    # hash falls in shard_index; see for_shard.
+    shard_index: Optional[int] = None
+    num_shards: int = 1
+    # AIMD control of max_in_flight and pack_size from request latency,
+    # errors and 429s, within the bounds below (pack_size is the ceiling of
+    # its own range); needs streaming.
+    adaptive: bool = False
+    adaptive_min_in_flight: int = 1
+    adaptive_max_in_flight: int = 64
+    adaptive_min_pack_size: int = 1
+    adaptive_log: Optional[str] = "dataset_with_arasaac.adaptive.jsonl"
+    # Planning before any request: junk words are dropped, and so are words
+    # whose normalized form is already an input of known_datasets or
+    # output_file (tracked in generated_index).
+    word_filters: WordFilters = field(default_factory=WordFilters)
+    generated_index: Optional[str] = "generated_inputs.sqlite"
+    known_datasets: List[str] = field(default_factory=lambda: ["dataset_wo_arasaac.csv", "dataset.csv"])
+    plan_only: bool = False
+    # Count the plan (one streaming pass over input_file) before sending
+    # anything; off, the first request goes out right away and the plan is
+    # summarized at the end.
+    plan_first: bool = True
+
+    def for_shard(self, shard_index: int, num_shards: int) -> "ArasaacConfig":
+        # Every file a run writes gets a per-shard name, so shards can run on
+        # separate processes or machines sharing nothing but a filesystem.
+        def per_shard(path: Optional[str]) -> Optional[str]:
+            return shard_path(path, shard_index, num_shards) if path else path
+
+        return replace(
+            self,
+            shard_index=shard_index,
+            num_shards=num_shards,
+            output_file=per_shard(self.output_file),
+            state_file=per_shard(self.state_file),
+            cache_file=per_shard(self.cache_file),
+            usage_log=per_shard(self.usage_log),
+            metrics_file=per_shard(self.metrics_file),
+            metrics_prometheus_file=per_shard(self.metrics_prometheus_file),
+            adaptive_log=per_shard(self.adaptive_log),
+            near_duplicate_index=per_shard(self.near_duplicate_index),
+            generated_index=per_shard(self.generated_index),
+        )
 
 class ArasaacProcessor:
     def __init__(self, config: ArasaacConfig, aac_service: AACService):
         self.config = config
         self.aac_service = aac_service
 
-    def load_words(self) -> List[str]:
-        try:
-            with open(self.config.input_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-                words = data.get("words", [])
-                return [word.strip() for word in words if word.strip()]
-        except Exception as e:
-            print(f"Error: {str(e)}")
-            return []
+    def _batches(self, words: Iterable[str]) -> Iterator[List[str]]:
+        words = iter(words)
+        while True:
+            batch = list(islice(words, self.config.batch_size))
+            if not batch:
+                return
+            yield batch
+
+    def load_words(self) -> WordSource:
+        return open_word_source(
+            self.config.input_file,
+            format=self.config.input_format,
+            key=self.config.input_key,
+            column=self.config.input_column,
+        )
+
+    def open_generated_index(self) -> Optional[GeneratedIndex]:
+        if not self.config.generated_index:
+            return None
+        index = GeneratedIndex(self.config.generated_index)
+        for path in self.config.known_datasets + [self.config.output_file]:
+            index.sync(path)
+        return index
+
+    def pending_words(
+        self, source: WordSource, index: Optional[GeneratedIndex], progress: ProgressIndex
+    ) -> Tuple[WordPlanner, Iterator[str]]:
+        words: Iterable[str] = source
+        if self.config.shard_index is not None:
+            words = (
+                word for word in words
+                if shard_of(word, self.config.num_shards) == self.config.shard_index
+            )
+        planner = WordPlanner(self.config.word_filters, index)
+        return planner, progress.iter_pending(planner.filter(words), retry_failed=self.config.retry_failed)
+
+    def print_plan(self, planner: WordPlanner, progress: ProgressIndex):
+        if self.config.shard_index is not None:
+            print(f"Shard {self.config.shard_index}/{self.config.num_shards}")
+        print(planner.summary())
+        print(f"Skipping {progress.skipped} words already processed or repeated")
+
+    def print_estimate(self, num_words: int):
+        model = getattr(self.aac_service.llm, "model_name", "")
+        estimate = estimate_cost(num_words, model, self.config.pack_size, self._get_card_system_prompt())
+        print(
+            f"Estimated {estimate['calls']} card calls, {estimate['prompt_tokens']} prompt + "
+            f"{estimate['completion_tokens']} completion tokens, ${estimate['cost_usd']:.2f} with {model or 'unknown model'}"
+        )
 
     def process_batch(self, batch: List[str]) -> List[DatasetRow]:
         try:
@@ -47,128 +185,248 @@ class ArasaacProcessor:
             return []
 
     def process_all_words(self) -> bool:
-        words = self.load_words()
-        if not words:
-            print("Error loading words")
+        try:
+            source = self.load_words()
+            index = self.open_generated_index()
+        except Exception as e:
+            print(f"Error loading words: {str(e)}")
             return False
 
-        total_batches = (len(words) + self.config.batch_size - 1) // self.config.batch_size
+        progress = ProgressIndex(self.config.state_file)
+        requeued = progress.reset_in_flight()
+        if requeued:
+            print(f"Requeued {requeued} words left in flight by a previous run")
+
+        total = None
         processed_count = 0
-        
+        uncommitted: List[str] = []
+        planner = None
         try:
-            with tqdm(total=len(words), desc="Processing words") as pbar:
-                for batch_idx in range(total_batches):
-                    start_idx = batch_idx * self.config.batch_size
-                    end_idx = start_idx + self.config.batch_size
-                    current_batch = words[start_idx:end_idx]
+            if self.config.plan_first or self.config.plan_only:
+                planner, pending_words = self.pending_words(source, index, progress)
+                total = sum(1 for _ in pending_words)
+                self.print_plan(planner, progress)
+                self.print_estimate(total)
+                planner.close()
+                if self.config.plan_only:
+                    return True
 
-                    new_data = self.process_batch(current_batch)
+            planner, pending_words = self.pending_words(source, index, progress)
+            sink = self.aac_service.get_sink(self.config.output_file)
+            if self.config.streaming:
+                results = self._stream_results(pending_words, progress)
+            else:
+                results = self._batch_results(pending_words, progress)
+
+            with tqdm(total=total, desc="Processing words") as pbar:
+                for new_data, done, failed in results:
+                    if failed:
+                        progress.mark_failed(failed, "no card generated")
                     if new_data:
-                        self.aac_service.update_dataset(self.config.output_file, new_data)
+                        sink.write(new_data)
+                        uncommitted.extend(done)
+                        if not sink.pending_batches:
+                            progress.mark_done(uncommitted)
+                            uncommitted = []
                         processed_count += len(new_data)
                         pbar.update(len(new_data))
-                        pbar.set_postfix_str(f"Processed words: {processed_count}/{len(words)}")
+                        pbar.set_postfix_str(f"Processed words: {processed_count}/{total or '?'}")
             
             print("Done processing all words")
+            if not self.config.plan_first:
+                self.print_plan(planner, progress)
             return True
 
         except KeyboardInterrupt:
-            print(f"\nKeyboard Interrupt in: {processed_count}/{len(words)}")
+            print(f"\nKeyboard Interrupt in: {processed_count}/{total or '?'}")
             return False
         except Exception as e:
             print(f"Error: {str(e)}\n{traceback.format_exc()}")
             return False
+        finally:
+            self.aac_service.close()
+            if uncommitted:
+                progress.mark_done(uncommitted)
+            print(f"Progress: {progress.counts()}")
+            progress.close()
+            if planner is not None:
+                planner.close()
+            if index is not None:
+                index.close()
+
+    def _batch_results(
+        self, words: Iterable[str], progress: ProgressIndex
+    ) -> Iterator[Tuple[List[DatasetRow], List[str], List[str]]]:
+        for current_batch in self._batches(words):
+            progress.mark_in_flight(current_batch)
+            new_data = self.process_batch(current_batch)
+            done, failed = self._split_batch(current_batch, new_data)
+            yield new_data, done, failed
+
+    def _stream_results(
+        self, words: Iterable[str], progress: ProgressIndex
+    ) -> Iterator[Tuple[List[DatasetRow], List[str], List[str]]]:
+        def source():
+            for current_batch in self._batches(words):
+                progress.mark_in_flight(current_batch)
+                yield from current_batch
+
+        new_data, done, failed = [], [], []
+        for word, response in self.aac_service.stream_cards(
+            source(), self._get_card_system_prompt()
+        ):
+            if response is None:
+                failed.append(word)
+            else:
+                new_data.append(
+                    DatasetRow(input=response.input, output="\n".join(response.output))
+                )
+                done.append(word)
+            if len(done) + len(failed) >= self.config.batch_size:
+                yield new_data, done, failed
+                new_data, done, failed = [], [], []
+        if done or failed:
+            yield new_data, done, failed
+
+    @staticmethod
+    def _split_batch(batch: List[str], rows: List[DatasetRow]) -> Tuple[List[str], List[str]]:
+        # Rows carry the requested word (CardRequest.input), not the model's echo.
+        generated = {normalize_word(row.input) for row in rows}
+        done = [word for word in batch if normalize_word(word) in generated]
+        failed = [word for word in batch if normalize_word(word) not in generated]
+        return done, failed
 
     @staticmethod
     def _get_card_system_prompt() -> str:
-        return """You will take the role of an expert assistant specialized in creating Augmentative and Alternative Communication (AAC) speech cards for children and individuals with various needs, including:
-                                    - Autism Spectrum Disorder (ASD)
-                                    - Speech impediments
-                                    - Motor coordination difficulties
-                                    - Developmental delays
-                                    - Communication disorders
-                                    - Non-verbal individuals
-
-                                    ALWAYS Format your response exactly as follows:
-
-                                    input: [word]
-                                    output: [list of options]
-
-                                    Rules for the output:
-                                    - Each option must have text, spoken_text, and an emoji, separated by commas
-                                    - Generate exactly 5 options following these guidelines:
-                                    * Use simple, clear, and direct language
-                                    * Maintain consistent sentence structures
-                                    * Use concrete rather than abstract concepts
-                                    * Include common daily situations
-                                    * Ensure phrases are age-appropriate
-                                    * Consider motor and speech limitations
-                                    * Use positive and encouraging language
-                                    * Avoid complex or ambiguous expressions
-                                    - Last element must be an emoji that is:
-                                    * Clearly recognizable
-                                    * Visually simple
-                                    * Directly related to the action/object
-                                    * High contrast
-                                    * Commonly used
-                                    - Use Brazilian Portuguese with:
-                                    * Simple grammar structures
-                                    * Clear pronunciation patterns
-                                    * Common everyday vocabulary
-                                    * Consistent verb tenses
-                                    * Direct communication style
-                                    - Do not include counters or extra text
-
-                                    Focus on:
-                                    - Basic needs
-                                    - Daily routines
-                                    - Emotional expressions
-                                    - Social interactions
-                                    - Emergency situations
-                                    - Common requests
-                                    - Personal care
-                                    - Learning activities
-
-                                    Example:
-                                    input: Ação
-                                    output: Abrir, eu quero abrir, 🔓
-                                    Fechar, eu quero fechar, 🔒
-                                    Ligar, eu quero ligar, 🔌
-                                    Desligar, eu quero desligar, 🔌❌
-                                    Subir, eu quero subir, ⬆️
-
-                                    input: Banheiro
-                                    output: Ir ao Banheiro, eu preciso ir ao banheiro, 🚻
-                                    Pedir para Usar o Banheiro, eu gostaria de usar o banheiro, 🚽
-                                    Lavar as Mãos, eu quero lavar as mãos, 🧼
-                                    Buscar Papel Higiênico, eu preciso de papel higiênico, 🧻
-                                    Desinfetar as Mãos, eu quero desinfetar as mãos, 🧴
-                                    
-                                    input: Inseto
-                                    output: Qual é o nome deste inseto?, como se chama este inseto? 🐞
-                                    Onde os insetos costumam viver?, onde os insetos normalmente se escondem? 🌿
-                                    Como os insetos se reproduzem?, como acontece a reprodução dos insetos? 🐜
-                                    Quais insetos são benéficos?, quais insetos são bons para o meio ambiente? 🌼
-                                    Por que os insetos são importantes?, por que os insetos são importantes para a natureza? 🌍
-                                    """
+        return CARD_SYSTEM_PROMPT
 
 def main():
+    parser = argparse.ArgumentParser(description="Generate AAC cards for the ARASAAC word list")
+    parser.add_argument("--shard", type=int, default=None, help="index of the shard to process")
+    parser.add_argument("--num-shards", type=int, default=1)
+    parser.add_argument("--output", default=None, help="dataset to write; shards get per-shard names")
+    parser.add_argument("--llm-backend", choices=["distilabel", "async", "router", "fake"], default=None)
+    parser.add_argument("--endpoints", default=None, help="endpoints file for the router backend")
+    parser.add_argument("--rpm", type=float, default=None)
+    parser.add_argument("--tpm", type=float, default=None)
+    parser.add_argument("--plan", action="store_true", help="print the plan and cost estimate, send nothing")
+    parser.add_argument(
+        "--adaptive", action="store_true", help="adapt in-flight requests and pack size at runtime (streams)"
+    )
+    args = parser.parse_args()
+
     try:
         config = ArasaacConfig()
+        if args.output:
+            config = replace(config, output_file=args.output)
+        if args.llm_backend:
+            config = replace(config, llm_backend=args.llm_backend)
+        if args.rpm is not None or args.tpm is not None:
+            config = replace(
+                config,
+                rpm=args.rpm if args.rpm is not None else config.rpm,
+                tpm=args.tpm if args.tpm is not None else config.tpm,
+            )
+        if args.endpoints:
+            config = replace(config, llm_backend="router", endpoints_file=args.endpoints)
+        if args.adaptive:
+            config = replace(config, adaptive=True, streaming=True)
+        if args.plan:
+            config = replace(config, plan_only=True)
+        if args.shard is not None:
+            config = config.for_shard(args.shard, args.num_shards)
+            # distilabel caches pipelines by name and step layout, not by
+            # data, so shards on one machine need separate cache folders.
+            os.environ.setdefault(
+                "DISTILABEL_CACHE_DIR",
+                os.path.join(
+                    os.path.expanduser("~/.cache/distilabel/pipelines"),
+                    f"shard-{args.shard:02d}-of-{args.num_shards:02d}",
+                ),
+            )
         
         if not Path(config.input_file).exists():
             print(f"File {config.input_file} not found")
             return
         
-        token = load_environment()
-        llm = initialize_llm(token)
-        aac_service = AACService(llm)
+        if config.llm_backend == "fake":
+            llm = FakeLLM()
+        elif config.llm_backend == "async":
+            token = load_environment()
+            llm = initialize_async_llm(
+                token,
+                # The adaptive limits, when on, decide how much of this is used.
+                max_concurrency=(
+                    max(config.max_concurrency, config.adaptive_max_in_flight)
+                    if config.adaptive
+                    else config.max_concurrency
+                ),
+                rpm=config.rpm,
+                tpm=config.tpm,
+                usage_log=config.usage_log,
+            )
+        elif config.llm_backend == "router":
+            llm = initialize_routing_llm(config.endpoints_file, usage_log=config.usage_log)
+        else:
+            token = load_environment()
+            llm = initialize_llm(token)
+        limits = (
+            AdaptiveLimits(
+                min_in_flight=config.adaptive_min_in_flight,
+                max_in_flight=config.adaptive_max_in_flight,
+                min_pack_size=config.adaptive_min_pack_size,
+                log_path=config.adaptive_log,
+            )
+            if config.adaptive
+            else None
+        )
+        aac_service = AACService(
+            llm,
+            SinkConfig(
+                buffer_batches=config.sink_buffer_batches,
+                fsync=config.sink_fsync,
+            ),
+            ResponseCache(config.cache_file, read_only=config.cache_read_only),
+            streaming=config.streaming,
+            max_in_flight=config.max_in_flight,
+            pack_size=config.pack_size,
+            hooks=(
+                [
+                    MetricsExporter(
+                        config.metrics_file,
+                        config.metrics_prometheus_file,
+                        config.metrics_interval,
+                    )
+                ]
+                if config.metrics_file or config.metrics_prometheus_file
+                else None
+            ),
+            near_duplicates=(
+                NearDuplicateIndex(
+                    config.near_duplicate_index,
+                    threshold=config.near_duplicate_threshold,
+                )
+                if config.near_duplicate_index
+                else None
+            ),
+        )
+        if limits is not None:
+            aac_service.add_hook(limits)
         
         processor = ArasaacProcessor(config, aac_service)
         success = processor.process_all_words()
+        if isinstance(llm, RoutingLLM) and llm.gauges().get("requests"):
+            # Only requests made in this process (the streaming path) count.
+            for stats in llm.endpoint_stats():
+                print(
+                    f"{stats['endpoint']}: {stats['successes']}/{stats['requests']} ok, "
+                    f"{stats['throttled']} throttled, {stats['ejections']} ejections, "
+                    f"{stats['mean_latency']:.2f}s mean latency"
+                )
         
         if not success:
             print("Process failed")
+            sys.exit(1)
 
     except Exception as e:
         print(f"Fatal Error: {str(e)}\n{traceback.format_exc()}")
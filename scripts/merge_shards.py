@@ -0,0 +1,26 @@
+import argparse
+import os
+import sys
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aac_struct_gen.sharding import merge_shards, shard_path
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Merge sharded dataset outputs into one dataset")
+    parser.add_argument("--num-shards", type=int, required=True)
+    parser.add_argument("--dataset", default="dataset_with_arasaac.csv", help="unsharded output name")
+    parser.add_argument("--output", default=None, help="defaults to --dataset")
+    args = parser.parse_args()
+
+    paths = [shard_path(args.dataset, index, args.num_shards) for index in range(args.num_shards)]
+    missing = [path for path in paths if not os.path.exists(path)]
+    if missing:
+        print(f"Missing shard outputs: {missing}")
+    output = args.output or args.dataset
+    total, kept = merge_shards(paths, output)
+    print(f"Merged {total} rows from {len(paths) - len(missing)} shards into {output}")
+    print(f"Duplicate inputs removed: {total - kept}")
+
+
+if __name__ == "__main__":
+    main()
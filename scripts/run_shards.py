@@ -0,0 +1,76 @@
+import argparse
+import os
+import subprocess
+import sys
+import time
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+from aac_struct_gen.sharding import merge_shards, shard_path
+
+SCRIPTS_DIR = os.path.dirname(os.path.abspath(__file__))
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Run generate_arasaac.py shards as local worker processes, then merge them"
+    )
+    parser.add_argument("--num-shards", type=int, required=True)
+    parser.add_argument("--workers", type=int, default=None, help="defaults to --num-shards")
+    parser.add_argument("--llm-backend", choices=["distilabel", "async", "router", "fake"], default=None)
+    parser.add_argument("--endpoints", default=None, help="endpoints file for the router backend")
+    parser.add_argument("--rpm", type=float, default=None, help="total requests/min, split across workers")
+    parser.add_argument("--tpm", type=float, default=None, help="total tokens/min, split across workers")
+    parser.add_argument("--dataset", default="dataset_with_arasaac.csv")
+    parser.add_argument("--no-merge", action="store_true")
+    args = parser.parse_args()
+
+    workers = args.workers or args.num_shards
+    pending = list(range(args.num_shards))
+    running = {}
+    failed = []
+    start = time.perf_counter()
+    while pending or running:
+        while pending and len(running) < workers:
+            index = pending.pop(0)
+            command = [
+                sys.executable,
+                os.path.join(SCRIPTS_DIR, "generate_arasaac.py"),
+                "--shard", str(index),
+                "--num-shards", str(args.num_shards),
+                "--output", args.dataset,
+            ]
+            if args.llm_backend:
+                command += ["--llm-backend", args.llm_backend]
+            if args.endpoints:
+                command += ["--endpoints", args.endpoints]
+            if args.rpm:
+                command += ["--rpm", str(args.rpm / workers)]
+            if args.tpm:
+                command += ["--tpm", str(args.tpm / workers)]
+            log = open(shard_path(args.dataset, index, args.num_shards) + ".log", "a", encoding="utf-8")
+            running[index] = (
+                subprocess.Popen(command, stdout=log, stderr=subprocess.STDOUT),
+                log,
+            )
+            print(f"Started shard {index}")
+        for index, (process, log) in list(running.items()):
+            if process.poll() is None:
+                continue
+            log.close()
+            del running[index]
+            if process.returncode:
+                failed.append(index)
+            print(f"Shard {index} finished with code {process.returncode}")
+        time.sleep(0.2)
+    print(f"All shards finished in {time.perf_counter() - start:.1f} s")
+
+    if failed:
+        print(f"Failed shards: {failed}; rerun them before merging")
+        sys.exit(1)
+    if not args.no_merge:
+        paths = [shard_path(args.dataset, index, args.num_shards) for index in range(args.num_shards)]
+        total, kept = merge_shards(paths, args.dataset)
+        print(f"Merged {total} rows into {args.dataset} ({total - kept} duplicates removed)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,44 @@
+from aac_struct_gen.adaptive import AdaptiveLimits
+from aac_struct_gen.fakes import FakeLLM
+from aac_struct_gen.prompts import CARD_SYSTEM_PROMPT
+from aac_struct_gen.services import AACService
+
+
+def window(limits: AdaptiveLimits, seconds: float, ok: bool):
+    for _ in range(limits.window):
+        limits.on_request(seconds, ok)
+
+
+def test_pack_size_adapts_within_the_configured_size():
+    service = AACService(FakeLLM(), streaming=True, max_in_flight=4, pack_size=4)
+    limits = AdaptiveLimits(max_in_flight=16, window=5)
+    service.add_hook(limits)
+    assert (service.stream.max_in_flight, service.pack_size) == (4, 4)
+
+    window(limits, 0.1, ok=False)
+    assert (service.stream.max_in_flight, service.pack_size) == (2, 2)
+    assert service._packed_kwargs() == {"max_new_tokens": 256 * 4}
+
+    for _ in range(4):
+        window(limits, 0.1, ok=True)
+    assert service.stream.max_in_flight > 2
+    assert service.pack_size == 4
+
+
+def test_unpacked_runs_stay_unpacked():
+    service = AACService(FakeLLM(), streaming=True, pack_size=1)
+    limits = AdaptiveLimits(window=5)
+    service.add_hook(limits)
+    for _ in range(3):
+        window(limits, 0.1, ok=True)
+    assert service.pack_size == 1
+
+
+def test_stream_cards_follows_the_adapted_pack_size():
+    service = AACService(FakeLLM(), streaming=True, pack_size=4)
+    limits = AdaptiveLimits(window=2)
+    service.add_hook(limits)
+    words = [f"palavra {index}" for index in range(24)]
+    cards = dict(service.stream_cards(words, CARD_SYSTEM_PROMPT))
+    assert set(cards) == set(words)
+    assert limits.decisions > 0
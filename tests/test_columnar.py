@@ -0,0 +1,27 @@
+import pandas as pd
+from aac_struct_gen.columnar import ParquetDatasetSink, frame_to_table, read_cards, table_to_frame, write_arrow
+from aac_struct_gen.sinks import SinkConfig
+
+OUTPUTS = [
+    "Uma pergunta, posso fazer uma pergunta? ❓\nEstou com frio, preciso de um casaco, 🧥  ",
+    "Mais espaço, preciso de mais espaço, ↔️\n\n  Linha sem emoji\nNúmero dois, eu quero o dois, 2️⃣",
+    "",
+]
+
+
+def test_csv_parquet_arrow_round_trip_keeps_outputs(tmp_path):
+    csv_path = tmp_path / "dataset.csv"
+    pd.DataFrame({"input": ["pergunta", "espaço", "vazio"], "output": OUTPUTS}).to_csv(csv_path, index=False)
+    original = pd.read_csv(csv_path, dtype=str, keep_default_na=False)
+
+    parquet_path = str(tmp_path / "dataset.parquet")
+    with ParquetDatasetSink(parquet_path, SinkConfig()) as sink:
+        sink.write_table(frame_to_table(original))
+    arrow_path = str(tmp_path / "dataset.arrow")
+    write_arrow(iter([read_cards(parquet_path)]), arrow_path)
+    frame = table_to_frame(read_cards(arrow_path))
+
+    assert frame["input"].tolist() == original["input"].tolist()
+    assert [output.encode("utf-8") for output in frame["output"]] == [
+        output.encode("utf-8") for output in original["output"]
+    ]
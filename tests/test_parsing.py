@@ -0,0 +1,39 @@
+import pytest
+from aac_struct_gen.parsing import option_parts, parse_options
+
+
+@pytest.mark.parametrize(
+    "line, emoji",
+    [
+        ("Eu quero comer, quero comer agora, 🍎", "🍎"),
+        ("Mais espaço, preciso de mais espaço, ↔️", "↔️"),
+        ("Tudo calmo, está tudo calmo, 〰️", "〰️"),
+        ("Número dois, eu quero o número dois, 2️⃣", "2️⃣"),
+        ("Número dois, eu quero o número dois, 2⃣", "2⃣"),
+        ("Jogo da velha, eu quero jogar, #️⃣", "#️⃣"),
+        ("Oi, eu estou aqui, 🙋‍♂️", "🙋‍♂️"),
+        ("Uma pergunta, posso fazer uma pergunta? ❓", "❓"),
+    ],
+)
+def test_option_parts_accepts_emoji(line, emoji):
+    parts = option_parts(line)
+    assert parts is not None
+    assert parts[2] == emoji
+
+
+@pytest.mark.parametrize(
+    "line",
+    [
+        "Dizer os números, eu quero dizer os números, 1234",
+        "Sem emoji, eu não tenho emoji",
+        "Só emoji, 🍎",
+    ],
+)
+def test_option_parts_rejects_invalid_lines(line):
+    assert option_parts(line) is None
+
+
+def test_parse_options_needs_five_options():
+    lines = [f"Opção {index}, eu quero a opção {index}, {index}️⃣" for index in range(1, 6)]
+    assert parse_options(lines) == [f"Opção {index}, eu quero a opção {index}, {index}️⃣" for index in range(1, 6)]
+    assert parse_options(lines[:4]) is None
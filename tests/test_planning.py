@@ -0,0 +1,16 @@
+from aac_struct_gen.planning import GeneratedIndex, WordFilters, WordPlanner
+
+
+def test_accented_word_matches_cleaned_dataset_input(tmp_path):
+    dataset = tmp_path / "dataset.csv"
+    dataset.write_text("input,output\nbiblia,x\nabraco,y\n", encoding="utf-8")
+    index = GeneratedIndex(str(tmp_path / "generated.sqlite"))
+    assert index.sync(str(dataset)) == 2
+
+    planner = WordPlanner(WordFilters(), index)
+    planned = list(planner.filter(["Bíblia", "abraço", "França"]))
+
+    assert planned == ["França"]
+    assert planner.already_generated == 2
+    planner.close()
+    index.close()
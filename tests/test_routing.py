@@ -0,0 +1,32 @@
+import asyncio
+import socket
+import httpx
+import pytest
+from aac_struct_gen.engine import ChatCompletionsLLM
+from aac_struct_gen.routing import RoutingLLM
+
+
+def closed_port_url() -> str:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    return f"http://127.0.0.1:{port}/v1"
+
+
+def endpoint() -> ChatCompletionsLLM:
+    return ChatCompletionsLLM(model="gpt-4o-mini", base_url=closed_port_url(), api_key="test", max_retries=0)
+
+
+def test_failover_skips_weight_zero_endpoint_and_raises_upstream_error():
+    router = RoutingLLM(endpoints=[endpoint(), endpoint(), endpoint()], weights=[1, 1, 0])
+    router.load()
+    with pytest.raises(httpx.ConnectError):
+        asyncio.run(router.agenerate(input=[{"role": "user", "content": "oi"}]))
+    stats = router.endpoint_stats()
+    assert [endpoint["requests"] for endpoint in stats] == [1, 1, 0]
+
+
+def test_all_weights_zero_is_rejected():
+    router = RoutingLLM(endpoints=[endpoint()], weights=[0])
+    with pytest.raises(ValueError):
+        router.load()
@@ -0,0 +1,37 @@
+from aac_struct_gen.cache import ResponseCache
+from aac_struct_gen.fakes import FakeLLM
+from aac_struct_gen.prompts import CARD_SYSTEM_PROMPT
+from aac_struct_gen.services import AACService
+
+WORDS = [f"palavra {index}" for index in range(40)]
+
+
+def requests_sent(llm) -> int:
+    report = llm.usage.report()
+    return report["total"]["requests"] if report else 0
+
+
+def test_warm_cache_rerun_sends_nothing_when_cards_fail_to_parse(tmp_path):
+    cache_path = str(tmp_path / "cache.sqlite")
+    llm = FakeLLM(malformed_rate=0.5)
+    service = AACService(llm, cache=ResponseCache(cache_path), streaming=True)
+    cards = service.generate_cards(WORDS, CARD_SYSTEM_PROMPT)
+    first = requests_sent(llm)
+    assert len(cards) < len(WORDS)
+    assert first > len(WORDS)
+    service.cache.close()
+
+    service = AACService(llm, cache=ResponseCache(cache_path), streaming=True)
+    rerun = service.generate_cards(WORDS, CARD_SYSTEM_PROMPT)
+    assert requests_sent(llm) == first
+    assert [card.input for card in rerun] == [card.input for card in cards]
+    service.cache.close()
+
+
+def test_retry_attempts_have_distinct_cache_keys():
+    service = AACService(FakeLLM())
+    keys = {
+        service._cache_key(service.card_request("casa", CARD_SYSTEM_PROMPT, attempt), {})
+        for attempt in range(3)
+    }
+    assert len(keys) == 3